@@ -1,10 +1,72 @@
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
 
+from posts import counters, search
+from posts.filters import AuthorListFilter, PeriodListFilter
 from posts.models import Comment, Follow, Group, Post
+from posts.utils import CountedPaginator
+
+
+class PreloadedAutocompleteSelect(AutocompleteSelect):
+    """Автодополнение, которое не запрашивает уже загруженный объект.
+
+    Обычный AutocompleteSelect достает выбранное значение отдельным
+    запросом, то есть по запросу на строку list_editable.
+    """
+
+    preloaded = None
+
+    def optgroups(self, name, value, attr=None):
+        obj = self.preloaded
+        selected = {str(v) for v in value if v not in ('', None)}
+        if obj is None or selected != {str(obj.pk)}:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        options.append(
+            self.create_option(
+                name,
+                obj.pk,
+                self.choices.field.label_from_instance(obj),
+                selected,
+                len(options),
+            ),
+        )
+        return [(None, options, 0)]
+
+
+class PreloadedAutocompleteMixin:
+    """Берет значения автодополнения в list_editable из list_select_related."""
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.get_autocomplete_fields(request):
+            kwargs.setdefault(
+                'widget',
+                PreloadedAutocompleteSelect(
+                    db_field.remote_field,
+                    self.admin_site,
+                    using=kwargs.get('using'),
+                ),
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_form(self, request, **kwargs):
+        form = super().get_changelist_form(request, **kwargs)
+
+        class PreloadedForm(form):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                for name, field in self.fields.items():
+                    widget = getattr(field.widget, 'widget', field.widget)
+                    if isinstance(widget, PreloadedAutocompleteSelect):
+                        widget.preloaded = getattr(self.instance, name)
+
+        return PreloadedForm
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(PreloadedAutocompleteMixin, admin.ModelAdmin):
     list_display = (
         'pk',
         'text',
@@ -13,10 +75,38 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
+    def get_paginator(self, request, queryset, per_page, **kwargs):
+        # Без фильтров и поиска число постов берется из счетчика,
+        # а не из COUNT(*) по всей таблице.
+        count = None if queryset.query.where else counters.index_count()
+        return CountedPaginator(queryset, per_page, count=count, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return super().get_search_results(
+                request,
+                queryset,
+                search_term,
+            )
+        return search.search(search_term, queryset), False
+
+    def get_ordering(self, request):
+        if (
+            search.is_supported()
+            and request.GET.get('q')
+            and 'o' not in request.GET
+        ):
+            return ('search__rank',)
+        return super().get_ordering(request)
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
@@ -39,7 +129,11 @@ class CommentAdmin(admin.ModelAdmin):
         'text',
         'post',
     )
-    list_filter = ('created',)
+    list_select_related = ('author', 'post')
+    autocomplete_fields = ('author', 'post')
+    list_filter = (('created', PeriodListFilter),)
+    date_hierarchy = 'created'
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
 
@@ -50,5 +144,8 @@ class FollowAdmin(admin.ModelAdmin):
         'user',
         'author',
     )
-    list_filter = ('author',)
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    list_filter = (('author', AuthorListFilter),)
+    show_full_result_count = False
     empty_value_display = '-пусто-'
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PostsConfig(AppConfig):
     name = 'posts'
     verbose_name = 'публикации'
+
+    def ready(self):
+        import posts.signals  # noqa: F401
@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+from hashlib import md5
+
+from django.views.decorators.http import condition
+
+from posts import versions
+from posts.models import Group, User
+
+
+def conditional(stamps_func):
+    """Декоратор условного GET по версиям выборок из posts.versions.
+
+    ETag и Last-Modified считаются по версиям из кэша, без запроса
+    страницы постов, поэтому на неизменившуюся страницу ответ 304
+    отдается без пагинации и рендеринга шаблона.
+
+    Args:
+        stamps_func: принимает аргументы представления и возвращает
+            список версий страницы или None, если страницы нет.
+    """
+
+    def stamps(request, *args, **kwargs):
+        if not hasattr(request, '_content_stamps'):
+            request._content_stamps = stamps_func(request, *args, **kwargs)
+        return request._content_stamps
+
+    def etag(request, *args, **kwargs):
+        content = stamps(request, *args, **kwargs)
+        if content is None:
+            return None
+        return md5(repr((request.user.pk, content)).encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        content = stamps(request, *args, **kwargs)
+        if content is None:
+            return None
+        return datetime.fromtimestamp(max(content), timezone.utc)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def index_stamps(request):
+    # Кнопки подписки на карточках зависят от подписок читателя.
+    return versions.get_versions(
+        versions.INDEX_SCOPE,
+        versions.follow_scope(request.user.pk),
+    )
+
+
+def group_stamps(request, slug):
+    group_id = (
+        Group.objects.filter(slug=slug).values_list('pk', flat=True).first()
+    )
+    if group_id is None:
+        return None
+    return versions.get_versions(versions.group_scope(group_id))
+
+
+def profile_stamps(request, username):
+    author_id = (
+        User.objects.filter(username=username)
+        .values_list('pk', flat=True)
+        .first()
+    )
+    if author_id is None:
+        return None
+    return versions.get_versions(
+        versions.author_scope(author_id),
+        versions.follow_scope(author_id),
+        versions.followers_scope(author_id),
+        versions.follow_scope(request.user.pk),
+    )
+
+
+index = conditional(index_stamps)
+group = conditional(group_stamps)
+profile = conditional(profile_stamps)
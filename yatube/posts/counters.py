@@ -0,0 +1,152 @@
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, F, Max
+from django.db.models.functions import Greatest
+
+from posts.models import Post, PostCount
+from yatube.settings import POSTS_COUNT_CACHE_TIMEOUT, POSTS_COUNT_ESTIMATE
+
+COUNT_KEY = 'posts:count:{scope}'
+INDEX_SCOPE = 'index'
+
+
+def group_scope(group_id: int) -> str:
+    return f'group:{group_id}'
+
+
+def author_scope(author_id: int) -> str:
+    return f'author:{author_id}'
+
+
+def _key(scope: str) -> str:
+    return COUNT_KEY.format(scope=scope)
+
+
+def estimate_total() -> int:
+    """Оценивает число строк в posts_post без COUNT(*).
+
+    PostgreSQL отдает оценку из статистики планировщика, остальные
+    базы — максимальный id, который берется из индекса первичного ключа.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [Post._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] > 0:
+            return int(row[0])
+    return Post.objects.aggregate(last=Max('pk'))['last'] or 0
+
+
+def _stored(scope: str, queryset) -> int:
+    """Счетчик из PostCount; без строки — COUNT(*) и новая строка."""
+    count = (
+        PostCount.objects.filter(scope=scope)
+        .values_list('count', flat=True)
+        .first()
+    )
+    if count is None:
+        count = queryset.count()
+        PostCount.objects.bulk_create(
+            [PostCount(scope=scope, count=count)],
+            ignore_conflicts=True,
+        )
+    return count
+
+
+def get_count(scope: str, queryset) -> int:
+    """Возвращает число постов в выборке.
+
+    Счетчик хранится в PostCount и читается через кэш. При первом
+    чтении он считается COUNT(*), дальше его поддерживают сигналы
+    записи постов. В режиме POSTS_COUNT_ESTIMATE общий счетчик ленты
+    берется из оценки вместо COUNT(*).
+    """
+    count = cache.get(_key(scope))
+    if count is None:
+        if POSTS_COUNT_ESTIMATE and scope == INDEX_SCOPE:
+            count = estimate_total()
+        else:
+            count = _stored(scope, queryset)
+        cache.add(_key(scope), count, POSTS_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def change_count(scope: str, delta: int) -> None:
+    """Меняет счетчик выборки на delta.
+
+    Счетчик меняется в базе одним UPDATE, а не через cache.incr: не
+    у всех бэкендов кэша он атомарен. Строку выборки создает ее первый
+    пост. Копия в кэше сбрасывается и еще раз после коммита, как в
+    posts.follows.forget.
+    """
+    counts = PostCount.objects.filter(scope=scope)
+    updated = counts.update(count=Greatest(F('count') + delta, 0))
+    if not updated and delta > 0:
+        _, created = PostCount.objects.get_or_create(
+            scope=scope,
+            defaults={'count': delta},
+        )
+        if not created:
+            counts.update(count=F('count') + delta)
+    key = _key(scope)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def index_count() -> int:
+    return get_count(INDEX_SCOPE, Post.objects.all())
+
+
+def group_count(group) -> int:
+    return get_count(group_scope(group.pk), group.posts.all())
+
+
+def author_count(author) -> int:
+    return get_count(author_scope(author.pk), author.posts.all())
+
+
+def feed_count(author_ids) -> int:
+    """Считает ленту подписок как сумму счетчиков ее авторов.
+
+    Счетчики авторов достаются из кэша одним запросом, недостающие —
+    одним запросом к PostCount, а авторы без счетчика досчитываются
+    одним сгруппированным запросом к posts_post.
+    """
+    keys = {_key(author_scope(pk)): pk for pk in author_ids}
+    cached = cache.get_many(keys)
+    missing = {
+        author_scope(pk): pk for key, pk in keys.items() if key not in cached
+    }
+    if missing:
+        counted = dict(
+            PostCount.objects.filter(scope__in=missing).values_list(
+                'scope',
+                'count',
+            ),
+        )
+        uncounted = [
+            pk for scope, pk in missing.items() if scope not in counted
+        ]
+        if uncounted:
+            fresh = dict.fromkeys(uncounted, 0)
+            fresh.update(
+                Post.objects.filter(author_id__in=uncounted)
+                .values_list('author_id')
+                .annotate(total=Count('pk'))
+                .order_by(),
+            )
+            PostCount.objects.bulk_create(
+                (
+                    PostCount(scope=author_scope(pk), count=n)
+                    for pk, n in fresh.items()
+                ),
+                ignore_conflicts=True,
+            )
+            counted.update((author_scope(pk), n) for pk, n in fresh.items())
+        copies = {_key(scope): n for scope, n in counted.items()}
+        cache.set_many(copies, POSTS_COUNT_CACHE_TIMEOUT)
+        cached.update(copies)
+    return sum(cached.values())
@@ -0,0 +1,232 @@
+import heapq
+from hashlib import md5
+from itertools import islice
+
+from django.core.cache import cache
+from django.db.models import F
+
+from posts import versions
+from posts.models import AuthorStats, Follow, Post, TimelineEntry
+from yatube.settings import (
+    FEED_PULLED_AUTHORS_TIMEOUT,
+    FEED_PUSH_FOLLOWERS_LIMIT,
+    TIMELINE_BATCH_SIZE,
+)
+
+PULLED_AUTHORS_KEY = 'feed:pulled_authors'
+FEED_ORDERING = ('-pub_date', '-pk')
+# Ключ сортировки ленты подписок — дата и id записи материализованной
+# ленты: их порядок совпадает с индексом (user, pub_date), в конце
+# которого лежит rowid записи.
+TIMELINE_FIELD = 'feed_pub_date'
+TIMELINE_TIEBREAK = 'feed_entry_id'
+TIMELINE_ORDERING = (f'-{TIMELINE_FIELD}', f'-{TIMELINE_TIEBREAK}')
+
+
+def pulled_author_ids() -> frozenset:
+    """Авторы, чьи посты не раскладываются по лентам, а читаются на лету.
+
+    Это авторы, у которых подписчиков больше FEED_PUSH_FOLLOWERS_LIMIT:
+    запись поста в ленту каждого из них стоила бы слишком дорого.
+    Автор остается в списке и после отписок до пересборки лент,
+    см. stats.change.
+    """
+    author_ids = cache.get(PULLED_AUTHORS_KEY)
+    if author_ids is None:
+        author_ids = frozenset(
+            AuthorStats.objects.filter(feed_pulled=True).values_list(
+                'author_id',
+                flat=True,
+            ),
+        )
+        cache.set(
+            PULLED_AUTHORS_KEY,
+            author_ids,
+            FEED_PULLED_AUTHORS_TIMEOUT,
+        )
+    return author_ids
+
+
+def refresh_pulled_authors() -> frozenset:
+    """Сверяет флаг feed_pulled с текущим числом подписчиков.
+
+    Вызывается пересборкой лент: только она возвращает посты авторов,
+    ушедших под порог, в ленты их подписчиков.
+
+    Returns:
+        Новый список авторов, читаемых на лету.
+    """
+    AuthorStats.objects.filter(
+        followers_count__gt=FEED_PUSH_FOLLOWERS_LIMIT,
+    ).update(feed_pulled=True)
+    AuthorStats.objects.filter(
+        feed_pulled=True,
+        followers_count__lte=FEED_PUSH_FOLLOWERS_LIMIT,
+    ).update(feed_pulled=False)
+    cache.delete(PULLED_AUTHORS_KEY)
+    return pulled_author_ids()
+
+
+def fan_out(post: Post) -> None:
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if post.author_id in pulled_author_ids():
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id',
+        flat=True,
+    )
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post.pk,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for user_id in followers.iterator()
+        ),
+        batch_size=TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id: int, *author_ids: int) -> None:
+    """Добавляет в ленту читателя уже опубликованные посты авторов."""
+    author_ids = set(author_ids) - pulled_author_ids()
+    if not author_ids:
+        return
+    posts = Post.objects.filter(author_id__in=author_ids).values_list(
+        'pk',
+        'author_id',
+        'pub_date',
+    )
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=pk,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for pk, author_id, pub_date in posts.iterator()
+        ),
+        batch_size=TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def prune(user_id: int, *author_ids: int) -> None:
+    """Убирает из ленты читателя посты авторов."""
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        author_id__in=author_ids,
+    ).delete()
+
+
+class MergedFeed:
+    """Несколько отсортированных выборок постов, слитых в одну.
+
+    Срез читает из каждой выборки не больше stop записей и сливает их
+    по ключу сортировки, поэтому страница получается упорядоченной так
+    же, как если бы это был один запрос. Поддерживает filter и order_by,
+    которых достаточно CursorPaginator.
+    """
+
+    ordered = True
+
+    def __init__(self, *querysets, ordering=FEED_ORDERING):
+        self.ordering = ordering
+        self.querysets = tuple(
+            queryset.order_by(*ordering) for queryset in querysets
+        )
+
+    @property
+    def model(self):
+        return self.querysets[0].model
+
+    @property
+    def query(self):
+        return self.querysets[0].query
+
+    def filter(self, *args, **kwargs) -> 'MergedFeed':
+        return MergedFeed(
+            *(queryset.filter(*args, **kwargs) for queryset in self.querysets),
+            ordering=self.ordering,
+        )
+
+    def order_by(self, *ordering) -> 'MergedFeed':
+        return MergedFeed(*self.querysets, ordering=ordering)
+
+    def count(self) -> int:
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def _key(self, post):
+        return tuple(
+            getattr(post, field.lstrip('-')) for field in self.ordering
+        )
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        merged = heapq.merge(
+            *(queryset[:stop] for queryset in self.querysets),
+            key=self._key,
+            reverse=self.ordering[0].startswith('-'),
+        )
+        return list(islice(merged, start, stop))
+
+
+def feed_version(user, author_ids) -> str:
+    """Версия ленты подписок читателя для ключа кэша фрагментов.
+
+    Складывается из версии графа подписок читателя, которую меняют
+    подписка и отписка, и версий всех его авторов, которые меняют их
+    новые, исправленные и удаленные посты.
+    """
+    stamps = versions.get_versions(
+        versions.follow_scope(user.pk),
+        *(versions.author_scope(pk) for pk in sorted(author_ids)),
+    )
+    return md5(repr(stamps).encode()).hexdigest()
+
+
+def timeline(user, author_ids):
+    """Лента подписок читателя.
+
+    Посты обычных авторов читаются обратным проходом по индексу
+    (user, pub_date) материализованной ленты, посты авторов с большим
+    числом подписчиков подтягиваются на лету и сливаются с ней.
+    Выдача упорядочена по TIMELINE_FIELD и TIMELINE_TIEBREAK, по ним
+    же ее листает курсор.
+    """
+    pushed = (
+        Post.objects.for_feed()
+        .filter(timeline_entries__user=user)
+        .annotate(
+            **{
+                TIMELINE_FIELD: F('timeline_entries__pub_date'),
+                TIMELINE_TIEBREAK: F('timeline_entries__id'),
+            },
+        )
+    )
+    pulled = pulled_author_ids().intersection(author_ids)
+    if not pulled:
+        return pushed.order_by(*TIMELINE_ORDERING)
+    # У постов, читаемых на лету, записи ленты нет, и вторым ключом
+    # служит id поста: по нему упорядочен индекс (author, pub_date).
+    return MergedFeed(
+        pushed.exclude(author_id__in=pulled),
+        Post.objects.for_feed()
+        .filter(author_id__in=pulled)
+        .annotate(
+            **{
+                TIMELINE_FIELD: F('pub_date'),
+                TIMELINE_TIEBREAK: F('pk'),
+            },
+        ),
+        ordering=TIMELINE_ORDERING,
+    )
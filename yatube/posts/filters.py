@@ -0,0 +1,200 @@
+import datetime
+from typing import Iterable, Optional, Tuple
+
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.utils import timezone
+
+from posts.models import AuthorStats, User
+from yatube.settings import ADMIN_FILTER_OPTIONS
+
+SEARCH_SUFFIX = '_q'
+# Верхняя граница поиска по префиксу: любая строка, начинающаяся
+# с префикса, меньше префикса с этим символом на конце.
+PREFIX_END = '\U0010ffff'
+PERIOD_FORMATS = (
+    ('%Y-%m-%d', 'day'),
+    ('%Y-%m', 'month'),
+    ('%Y', 'year'),
+)
+
+
+class SearchableListFilter(admin.FieldListFilter):
+    """Фильтр боковой панели с коротким списком и поиском по остальным.
+
+    Без поиска показывает не больше ADMIN_FILTER_OPTIONS вариантов,
+    остальные находятся через поле поиска одним запросом по индексу.
+    Наследники реализуют options и lookup.
+    """
+
+    template = 'admin/posts/searchable_filter.html'
+    limit = ADMIN_FILTER_OPTIONS
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.search_parameter_name = field_path + SEARCH_SUFFIX
+        super().__init__(
+            field,
+            request,
+            params,
+            model,
+            model_admin,
+            field_path,
+        )
+        self.value = self.used_parameters.get(field_path)
+        self.search = self.used_parameters.get(
+            self.search_parameter_name,
+            '',
+        ).strip()
+        self.hidden_params = ()
+
+    def expected_parameters(self):
+        return [self.field_path, self.search_parameter_name]
+
+    def options(self, search: str) -> Iterable[Tuple[str, str]]:
+        """Возвращает пары (значение, подпись) для боковой панели.
+
+        Args:
+            search: строка из поля поиска; пустая — короткий список
+                самых востребованных вариантов.
+        """
+        raise NotImplementedError
+
+    def lookup(self, value: str) -> dict:
+        """Превращает значение параметра в условия для filter().
+
+        Raises:
+            IncorrectLookupParameters: значение не разбирается.
+        """
+        raise NotImplementedError
+
+    def label(self, value: str) -> str:
+        """Подпись для выбранного значения, не попавшего в список."""
+        return value
+
+    def queryset(self, request, queryset):
+        if not self.value:
+            return queryset
+        return queryset.filter(**self.lookup(self.value))
+
+    def choices(self, changelist):
+        ours = self.expected_parameters()
+        self.hidden_params = tuple(
+            (key, value)
+            for key, value in changelist.params.items()
+            if key not in ours
+        )
+        yield {
+            'selected': not self.value,
+            'query_string': changelist.get_query_string(remove=ours),
+            'display': 'Все',
+        }
+        options = [
+            (str(value), label)
+            for value, label in self.options(self.search)[:self.limit]
+        ]
+        if self.value and self.value not in dict(options):
+            options.insert(0, (self.value, self.label(self.value)))
+        for value, label in options:
+            yield {
+                'selected': value == self.value,
+                'query_string': changelist.get_query_string(
+                    {self.field_path: value},
+                    [self.search_parameter_name],
+                ),
+                'display': label,
+            }
+
+
+class AuthorListFilter(SearchableListFilter):
+    """Авторы с наибольшим числом подписчиков и поиск по началу логина."""
+
+    def options(self, search):
+        if search:
+            # Диапазон по уникальному индексу username вместо LIKE,
+            # который SQLite не ведет по индексу.
+            return (
+                User.objects.filter(
+                    username__gte=search,
+                    username__lt=search + PREFIX_END,
+                )
+                .order_by('username')
+                .values_list('pk', 'username')
+            )
+        return (
+            AuthorStats.objects.filter(followers_count__gt=0)
+            .order_by('-followers_count')
+            .values_list('author_id', 'author__username')
+        )
+
+    def lookup(self, value):
+        try:
+            return {self.field_path: int(value)}
+        except ValueError as error:
+            raise IncorrectLookupParameters(error)
+
+    def label(self, value):
+        username = (
+            User.objects.filter(pk=int(value))
+            .values_list('username', flat=True)
+            .first()
+        )
+        return username or value
+
+
+def parse_period(value: str) -> Optional[Tuple[datetime.date, str]]:
+    """Разбирает период вида ГГГГ, ГГГГ-ММ или ГГГГ-ММ-ДД.
+
+    Returns:
+        Пара (первый день периода, его длина) или None.
+    """
+    for date_format, kind in PERIOD_FORMATS:
+        try:
+            start = datetime.datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+        return start, kind
+    return None
+
+
+def period_end(start: datetime.date, kind: str) -> datetime.date:
+    if kind == 'day':
+        return start + datetime.timedelta(days=1)
+    if kind == 'month':
+        if start.month == 12:
+            return start.replace(year=start.year + 1, month=1)
+        return start.replace(month=start.month + 1)
+    return start.replace(year=start.year + 1)
+
+
+def start_of_day(day: datetime.date) -> datetime.datetime:
+    return timezone.make_aware(
+        datetime.datetime.combine(day, datetime.time.min),
+    )
+
+
+class PeriodListFilter(SearchableListFilter):
+    """Последние месяцы и поиск по дню, месяцу или году.
+
+    Варианты строятся от текущей даты без обращения к базе, а выбранный
+    период превращается в диапазон по индексированному полю.
+    """
+
+    def options(self, search):
+        if search:
+            return [(search, search)] if parse_period(search) else []
+        month = timezone.localdate().replace(day=1)
+        months = []
+        for _ in range(self.limit):
+            months.append((month.strftime('%Y-%m'), month.strftime('%m.%Y')))
+            month = (month - datetime.timedelta(days=1)).replace(day=1)
+        return months
+
+    def lookup(self, value):
+        period = parse_period(value)
+        if period is None:
+            raise IncorrectLookupParameters(value)
+        start, kind = period
+        return {
+            f'{self.field_path}__gte': start_of_day(start),
+            f'{self.field_path}__lt': start_of_day(period_end(start, kind)),
+        }
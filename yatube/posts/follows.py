@@ -0,0 +1,180 @@
+from array import array
+from hashlib import md5
+from typing import FrozenSet, Iterable, List
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from posts import counters, feed, stats, versions
+from posts.models import Follow, User
+from yatube.settings import FOLLOWING_CACHE_TIMEOUT
+
+FOLLOWING_KEY = 'follows:following:{user_id}'
+# Множество лежит в кэше отсортированным массивом 32-битных id
+# (AutoField в них помещается): 4 байта на автора, и при чтении
+# не нужно распаковывать pickle от set по одному элементу.
+ID_TYPECODE = 'I'
+
+
+def _key(user_id: int) -> str:
+    return FOLLOWING_KEY.format(user_id=user_id)
+
+
+def _packed(user_id: int) -> bytes:
+    packed = cache.get(_key(user_id))
+    if packed is None:
+        packed = array(
+            ID_TYPECODE,
+            sorted(
+                Follow.objects.filter(user_id=user_id).values_list(
+                    'author_id',
+                    flat=True,
+                ),
+            ),
+        ).tobytes()
+        cache.set(_key(user_id), packed, FOLLOWING_CACHE_TIMEOUT)
+    return packed
+
+
+def following_ids(user) -> FrozenSet[int]:
+    """id авторов, на которых подписан читатель.
+
+    Множество читается из общего кэша и грузится из базы одним запросом
+    при промахе, поэтому проверка подписки на любое число авторов
+    страницы обходится без SQL. У анонима подписок нет.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    ids = array(ID_TYPECODE)
+    ids.frombytes(_packed(user.pk))
+    return frozenset(ids)
+
+
+def following_digest(ids: Iterable[int]) -> str:
+    """Короткий ключ множества подписок для кэша фрагментов."""
+    return md5(array(ID_TYPECODE, sorted(ids)).tobytes()).hexdigest()
+
+
+def own_posts_key(user) -> str:
+    """Часть ключа фрагмента, отличающая автора от других читателей.
+
+    Фрагмент с кнопками подписки общий для читателей с одинаковыми
+    подписками, но у собственных постов кнопки нет. Поэтому читатель,
+    у которого есть посты, получает свой фрагмент, а остальные
+    делят его по following_digest. Число постов берется из счетчика.
+    """
+    if user.is_authenticated and counters.author_count(user):
+        return str(user.pk)
+    return ''
+
+
+def forget(*user_ids: int) -> None:
+    """Сбрасывает кэш подписок читателей.
+
+    Сброс повторяется после коммита: иначе параллельный запрос мог бы
+    успеть положить в кэш состояние до изменения.
+    """
+    keys = [_key(pk) for pk in user_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _bump(user_id: int, author_ids: Iterable[int]) -> None:
+    versions.bump(
+        versions.follow_scope(user_id),
+        *(versions.followers_scope(pk) for pk in author_ids),
+    )
+
+
+def _columns():
+    table = Follow._meta.db_table
+    user = Follow._meta.get_field('user').column
+    author = Follow._meta.get_field('author').column
+    return tuple(map(connection.ops.quote_name, (table, user, author)))
+
+
+def _insert(user_id: int, author_ids: List[int]) -> List[int]:
+    """Вставляет подписки и возвращает авторов вставленных строк.
+
+    ON CONFLICT DO NOTHING RETURNING (SQLite 3.35+, PostgreSQL)
+    возвращает только строки, вставленные этим запросом. Пару, которую
+    параллельно записал profile_follow, уже учел его сигнал.
+    """
+    table, user, author = _columns()
+    rows = ', '.join(['(%s, %s)'] * len(author_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({user}, {author}) VALUES {rows} '
+            f'ON CONFLICT DO NOTHING RETURNING {author}',
+            [value for pk in author_ids for value in (user_id, pk)],
+        )
+        return sorted(pk for pk, in cursor.fetchall())
+
+
+def _delete(user_id: int, author_ids: List[int]) -> List[int]:
+    """Удаляет подписки одним DELETE и возвращает авторов удаленных строк.
+
+    На Follow никто не ссылается, поэтому строки можно удалить, минуя
+    сигнал follow_deleted на каждую строку. Строку, которую параллельно
+    удалил profile_unfollow, RETURNING не вернет.
+    """
+    table, user, author = _columns()
+    placeholders = ', '.join(['%s'] * len(author_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} '
+            f'WHERE {user} = %s AND {author} IN ({placeholders}) '
+            f'RETURNING {author}',
+            [user_id, *author_ids],
+        )
+        return sorted(pk for pk, in cursor.fetchall())
+
+
+def follow_many(user, author_ids: Iterable[int]) -> List[int]:
+    """Подписывает читателя на нескольких авторов одной транзакцией.
+
+    Уже существующие подписки, подписка на себя и несуществующие
+    авторы пропускаются. Вставка идет мимо сигналов, поэтому
+    статистика, лента и версии обновляются здесь теми же шагами, что
+    и в сигнале follow_created, но пачкой и только на вставленные
+    строки.
+
+    Returns:
+        id авторов, подписка на которых появилась.
+    """
+    with transaction.atomic():
+        authors = sorted(
+            User.objects.filter(pk__in=set(author_ids))
+            .exclude(pk=user.pk)
+            .values_list('pk', flat=True),
+        )
+        created = _insert(user.pk, authors) if authors else []
+        if not created:
+            return []
+        stats.change(*created, followers_count=1)
+        stats.change(user.pk, following_count=len(created))
+        feed.backfill(user.pk, *created)
+        _bump(user.pk, created)
+        forget(user.pk)
+    return created
+
+
+def unfollow_many(user, author_ids: Iterable[int]) -> List[int]:
+    """Отписывает читателя от нескольких авторов одной транзакцией.
+
+    Returns:
+        id авторов, подписка на которых была удалена.
+    """
+    author_ids = sorted(set(author_ids))
+    if not author_ids:
+        return []
+    with transaction.atomic():
+        removed = _delete(user.pk, author_ids)
+        if not removed:
+            return []
+        stats.change(*removed, followers_count=-1)
+        stats.change(user.pk, following_count=-len(removed))
+        feed.prune(user.pk, *removed)
+        _bump(user.pk, removed)
+        forget(user.pk)
+    return removed
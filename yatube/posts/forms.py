@@ -1,6 +1,14 @@
+from django import forms
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
 
-from posts.models import Comment, Post
+from posts import thumbnails, uploads
+from posts.models import Comment, Post, User
+from yatube.settings import FOLLOW_BULK_LIMIT
+
+FOLLOW = 'follow'
+UNFOLLOW = 'unfollow'
 
 
 class PostForm(ModelForm):
@@ -12,8 +20,45 @@ class PostForm(ModelForm):
             'image',
         )
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            uploads.check_limits(image)
+            image = uploads.downscale(image)
+        return image
+
+    def save(self, commit=True):
+        post = super().save(commit)
+        if commit and 'image' in self.changed_data:
+            thumbnails.schedule(post)
+        return post
+
 
 class CommentForm(ModelForm):
     class Meta:
         model = Comment
         fields = ('text',)
+
+
+class AuthorsField(forms.ModelMultipleChoiceField):
+    """Список авторов по логинам, не длиннее FOLLOW_BULK_LIMIT."""
+
+    def clean(self, value):
+        # Длина проверяется до запроса, который выбирает авторов по IN.
+        if value and len(value) > FOLLOW_BULK_LIMIT:
+            raise ValidationError(
+                'Не больше %(limit)s авторов за раз.',
+                code='too_many',
+                params={'limit': FOLLOW_BULK_LIMIT},
+            )
+        return super().clean(value)
+
+
+class BulkFollowForm(forms.Form):
+    action = forms.ChoiceField(
+        choices=((FOLLOW, 'подписаться'), (UNFOLLOW, 'отписаться')),
+    )
+    authors = AuthorsField(
+        queryset=User.objects.all(),
+        to_field_name='username',
+    )
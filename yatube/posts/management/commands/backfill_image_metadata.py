@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+
+from posts import uploads
+from posts.models import Post
+from yatube.settings import MEDIA_MIGRATION_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        'Записывает размеры, объем и формат картинок постам, созданным '
+        'до появления этих полей. Каждый файл читается один раз, даже '
+        'если на него ссылается несколько постов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=MEDIA_MIGRATION_BATCH_SIZE,
+        )
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        pending = Post.objects.exclude(image='').filter(
+            image_width__isnull=True,
+        )
+        filled = failed = 0
+        last = ''
+        while True:
+            names = list(
+                pending.filter(image__gt=last)
+                .order_by('image')
+                .values_list('image', flat=True)
+                .distinct()[: options['batch_size']],
+            )
+            if not names:
+                break
+            last = names[-1]
+            for name in names:
+                try:
+                    with storage.open(name) as file:
+                        metadata = uploads.read_metadata(file)
+                except OSError:
+                    metadata = None
+                if metadata is None:
+                    failed += 1
+                    self.stderr.write(f'Не удалось прочитать {name}.')
+                    continue
+                filled += pending.filter(image=name).update(**metadata)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Метаданные записаны постам: {filled}, '
+                f'нечитаемых файлов: {failed}.',
+            ),
+        )
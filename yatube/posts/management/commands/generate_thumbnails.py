@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from yatube.settings import THUMBNAIL_BATCH_SIZE, THUMBNAIL_POLL_INTERVAL
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит миниатюры картинок из очереди ThumbnailTask. Без --once '
+        'работает как фоновый воркер и опрашивает очередь каждые '
+        'THUMBNAIL_POLL_INTERVAL секунд.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Разобрать очередь и выйти.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=THUMBNAIL_BATCH_SIZE,
+        )
+
+    def handle(self, *args, **options):
+        done = 0
+        while True:
+            processed = thumbnails.process(options['batch_size'])
+            done += processed
+            if processed:
+                continue
+            if options['once']:
+                break
+            time.sleep(THUMBNAIL_POLL_INTERVAL)
+        self.stdout.write(
+            self.style.SUCCESS(f'Построены миниатюры постов: {done}.'),
+        )
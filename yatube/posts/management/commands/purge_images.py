@@ -0,0 +1,65 @@
+import datetime
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from sorl.thumbnail import delete as delete_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from posts.models import ImageRelease, Post
+from yatube.settings import IMAGE_RELEASE_GRACE
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки, на которые не осталось ссылок, вместе с '
+        'миниатюрами. Картинка удаляется не раньше IMAGE_RELEASE_GRACE '
+        'секунд после освобождения и последней повторной загрузки. '
+        'Запускается по расписанию.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=IMAGE_RELEASE_GRACE,
+        )
+
+    def handle(self, *args, **options):
+        grace = options['grace']
+        storage = Post._meta.get_field('image').storage
+        cutoff = timezone.now() - datetime.timedelta(seconds=grace)
+        releases = ImageRelease.objects.filter(
+            released__lte=cutoff,
+        ).values_list('name', 'released')
+        purged = kept = 0
+        for name, released in releases.iterator():
+            # Запись забирает тот, чей DELETE ее удалил, как и задачи
+            # на миниатюры.
+            claimed, _ = ImageRelease.objects.filter(
+                name=name,
+                released=released,
+            ).delete()
+            if not claimed or Post.objects.filter(image=name).exists():
+                continue
+            try:
+                if not storage.delete_idle(name, grace):
+                    # Файл загрузили снова: проверим его еще раз позже,
+                    # если та загрузка не закоммитится.
+                    ImageRelease.objects.update_or_create(name=name)
+                    kept += 1
+                    continue
+                delete_thumbnails(ImageFile(name, storage), delete_file=False)
+            except SuspiciousFileOperation as error:
+                self.stderr.write(f'Не удалось удалить {name}: {error}')
+                continue
+            except OSError as error:
+                self.stderr.write(f'Не удалось удалить {name}: {error}')
+                ImageRelease.objects.update_or_create(name=name)
+                continue
+            purged += 1
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Удалено картинок: {purged}, загружены снова: {kept}.',
+            ),
+        )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает статистику авторов (посты, подписчики, подписки), '
+        'если счетчики разошлись с таблицами.'
+    )
+
+    def handle(self, *args, **options):
+        rebuilt = stats.rebuild_all()
+        self.stdout.write(
+            self.style.SUCCESS(f'Статистика пересчитана, авторов: {rebuilt}.'),
+        )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересоздает полнотекстовый индекс постов и триггеры, которые '
+        'держат его в актуальном состоянии.'
+    )
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stderr.write('Полнотекстовый индекс есть только на SQLite.')
+            return
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс пересобран.'))
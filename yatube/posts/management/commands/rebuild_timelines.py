@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from posts import feed
+from posts.models import Follow, TimelineEntry
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает материализованные ленты подписок. Нужна после '
+        'изменения FEED_PUSH_FOLLOWERS_LIMIT и чтобы вернуть в ленты '
+        'авторов, у которых подписчиков стало меньше порога.'
+    )
+
+    def handle(self, *args, **options):
+        pulled = feed.refresh_pulled_authors()
+        removed, _ = TimelineEntry.objects.filter(
+            author_id__in=pulled,
+        ).delete()
+        follows = Follow.objects.exclude(author_id__in=pulled).values_list(
+            'user_id',
+            'author_id',
+        )
+        for user_id, author_id in follows.iterator():
+            feed.backfill(user_id, author_id)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Ленты пересобраны, удалено записей: {removed}.',
+            ),
+        )
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from sorl.thumbnail import delete as delete_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+from posts import versions
+from posts.models import Post, ThumbnailTask
+from posts.storage import is_sharded
+from yatube.settings import MEDIA_MIGRATION_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов из плоского каталога в дерево по хэшу '
+        'содержимого и обновляет Post.image пачками. Старые миниатюры '
+        'удаляются, новые ставятся в очередь generate_thumbnails. '
+        'Можно прерывать и запускать повторно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=MEDIA_MIGRATION_BATCH_SIZE,
+        )
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        moved = missing = 0
+        last = ''
+        while True:
+            names = list(
+                Post.objects.filter(image__gt=last)
+                .order_by('image')
+                .values_list('image', flat=True)
+                .distinct()[: options['batch_size']],
+            )
+            if not names:
+                break
+            last = names[-1]
+            names = [name for name in names if not is_sharded(name)]
+            for name in names:
+                if not storage.exists(name):
+                    missing += 1
+                    self.stderr.write(f'Нет файла {name}, пропущен.')
+                    continue
+                self.move(storage, name)
+                moved += 1
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Перенесено файлов: {moved}, не найдено: {missing}.',
+            ),
+        )
+
+    def move(self, storage, name):
+        with storage.open(name) as content:
+            new_name = storage.save(name, content)
+        posts = Post.objects.filter(image=name)
+        with transaction.atomic():
+            affected = list(posts.values_list('pk', 'author_id', 'group_id'))
+            posts.update(image=new_name)
+            ThumbnailTask.objects.bulk_create(
+                (ThumbnailTask(post_id=pk) for pk, _, _ in affected),
+                ignore_conflicts=True,
+            )
+        scopes = {versions.INDEX_SCOPE}
+        for _, author_id, group_id in affected:
+            scopes.add(versions.author_scope(author_id))
+            if group_id:
+                scopes.add(versions.group_scope(group_id))
+        versions.bump(*scopes)
+        delete_thumbnails(ImageFile(name, storage))
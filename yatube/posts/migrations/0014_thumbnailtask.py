@@ -0,0 +1,40 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('posts', '0013_authorstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThumbnailTask',
+            fields=[
+                (
+                    'post',
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name='+',
+                        serialize=False,
+                        to='posts.Post',
+                        verbose_name='пост',
+                    ),
+                ),
+                (
+                    'created',
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name='дата постановки'
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'задача на миниатюры',
+                'verbose_name_plural': 'задачи на миниатюры',
+                'ordering': ('created',),
+            },
+        ),
+    ]
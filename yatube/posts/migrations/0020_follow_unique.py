@@ -0,0 +1,56 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:06
+
+from django.db import migrations, models
+from django.db.models.functions import Greatest
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    """Оставляет по одной подписке на пару (user, author).
+
+    Дубли попадали и в счетчики статистики, поэтому они уменьшаются
+    на число удаленных строк.
+    """
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Follow = apps.get_model('posts', 'Follow')
+    duplicates = list(
+        Follow.objects.values('user_id', 'author_id')
+        .annotate(keep=models.Min('pk'), total=models.Count('pk'))
+        .filter(total__gt=1)
+        .order_by()
+    )
+    for row in duplicates:
+        extra = row['total'] - 1
+        Follow.objects.filter(
+            user_id=row['user_id'],
+            author_id=row['author_id'],
+        ).exclude(pk=row['keep']).delete()
+        AuthorStats.objects.filter(author_id=row['author_id']).update(
+            followers_count=Greatest(models.F('followers_count') - extra, 0),
+        )
+        AuthorStats.objects.filter(author_id=row['user_id']).update(
+            following_count=Greatest(models.F('following_count') - extra, 0),
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('posts', '0019_view_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            remove_duplicate_follows,
+            migrations.RunPython.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(
+                fields=('user', 'author'), name='follow_user_author_unique'
+            ),
+        ),
+        # Уникальный индекс ограничения покрывает те же запросы.
+        migrations.RemoveIndex(
+            model_name='follow',
+            name='follow_user_author_idx',
+        ),
+    ]
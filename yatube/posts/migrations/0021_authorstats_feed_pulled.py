@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:24
+
+from django.db import migrations, models
+
+from yatube.settings import FEED_PUSH_FOLLOWERS_LIMIT
+
+
+def flag_pulled_authors(apps, schema_editor):
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    AuthorStats.objects.filter(
+        followers_count__gt=FEED_PUSH_FOLLOWERS_LIMIT,
+    ).update(feed_pulled=True)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('posts', '0020_follow_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='feed_pulled',
+            field=models.BooleanField(
+                db_index=True, default=False, verbose_name='читается на лету'
+            ),
+        ),
+        migrations.RunPython(flag_pulled_authors, migrations.RunPython.noop),
+    ]
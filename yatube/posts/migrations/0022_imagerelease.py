@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('posts', '0021_authorstats_feed_pulled'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageRelease',
+            fields=[
+                (
+                    'name',
+                    models.CharField(
+                        max_length=255,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='файл',
+                    ),
+                ),
+                (
+                    'released',
+                    models.DateTimeField(
+                        auto_now=True,
+                        db_index=True,
+                        verbose_name='дата освобождения',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'освобожденная картинка',
+                'verbose_name_plural': 'освобожденные картинки',
+                'ordering': ('released',),
+            },
+        ),
+    ]
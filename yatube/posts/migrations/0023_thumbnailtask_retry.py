@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:55
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('posts', '0022_imagerelease'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='thumbnailtask',
+            options={
+                'ordering': ('run_after',),
+                'verbose_name': 'задача на миниатюры',
+                'verbose_name_plural': 'задачи на миниатюры',
+            },
+        ),
+        migrations.AddField(
+            model_name='thumbnailtask',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(
+                default=0, verbose_name='неудачных попыток'
+            ),
+        ),
+        migrations.AddField(
+            model_name='thumbnailtask',
+            name='run_after',
+            field=models.DateTimeField(
+                db_index=True,
+                default=django.utils.timezone.now,
+                verbose_name='выполнить не раньше',
+            ),
+        ),
+    ]
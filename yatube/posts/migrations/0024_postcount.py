@@ -0,0 +1,53 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:57
+
+from django.db import migrations, models
+
+
+def count_posts(apps, schema_editor):
+    """Заводит счетчики ленты, групп и авторов для уже созданных постов."""
+    Post = apps.get_model('posts', 'Post')
+    PostCount = apps.get_model('posts', 'PostCount')
+    counts = [PostCount(scope='index', count=Post.objects.count())]
+    for field, prefix in (('group_id', 'group'), ('author_id', 'author')):
+        counts.extend(
+            PostCount(scope=f'{prefix}:{pk}', count=total)
+            for pk, total in Post.objects.exclude(**{field: None})
+            .values_list(field)
+            .annotate(total=models.Count('pk'))
+            .order_by()
+        )
+    PostCount.objects.bulk_create(counts, batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('posts', '0023_thumbnailtask_retry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostCount',
+            fields=[
+                (
+                    'scope',
+                    models.CharField(
+                        max_length=64,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='выборка',
+                    ),
+                ),
+                (
+                    'count',
+                    models.PositiveIntegerField(
+                        default=0, verbose_name='постов'
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'счетчик постов',
+                'verbose_name_plural': 'счетчики постов',
+            },
+        ),
+        migrations.RunPython(count_posts, migrations.RunPython.noop),
+    ]
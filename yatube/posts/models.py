@@ -1,10 +1,34 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.utils import timezone
 
+from posts.storage import ContentAddressedStorage
 from yatube.settings import REDUCTION_SYMB_NUM
 
 User = get_user_model()
 FOLLOWING_STRING = '{user} подписан на {author}'
+TIMELINE_STRING = 'пост {post} в ленте {user}'
+THUMBNAIL_TASK_STRING = 'миниатюры поста {post}'
+IMAGE_RELEASE_STRING = 'удаление картинки {name}'
+POST_COUNT_STRING = '{scope}: постов {count}'
+STATS_STRING = (
+    'автор {author}: постов {posts}, подписчиков {followers}, '
+    'подписок {following}'
+)
+FEED_FIELDS = (
+    'text',
+    'pub_date',
+    'image',
+    'image_width',
+    'image_height',
+    'author',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'group',
+    'group__slug',
+    'group__title',
+)
 
 
 class Group(models.Model):
@@ -28,6 +52,16 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для карточек ленты.
+
+        Автор и группа приходят тем же запросом, а из колонок читаются
+        только нужные карточке (FEED_FIELDS).
+        """
+        return self.select_related('author', 'group').only(*FEED_FIELDS)
+
+
 class Post(models.Model):
     author = models.ForeignKey(
         User,
@@ -48,10 +82,56 @@ class Post(models.Model):
         auto_now_add=True,
     )
     text = models.TextField(verbose_name='текст')
-    image = models.ImageField('картинка', upload_to='posts/', blank=True)
+    image = models.ImageField(
+        'картинка',
+        upload_to='posts/',
+        blank=True,
+        db_index=True,
+        storage=ContentAddressedStorage(),
+    )
+    image_width = models.PositiveIntegerField(
+        'ширина картинки',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    image_height = models.PositiveIntegerField(
+        'высота картинки',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    image_size = models.PositiveIntegerField(
+        'размер картинки, байт',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    image_format = models.CharField(
+        'формат картинки',
+        max_length=10,
+        blank=True,
+        editable=False,
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = (
+            # Индексы по возрастанию: обратный проход по ним отдает
+            # ORDER BY pub_date DESC, id DESC без сортировки, потому что
+            # SQLite хранит в конце ключа rowid, тоже по возрастанию.
+            models.Index(fields=('pub_date',), name='post_pub_date_idx'),
+            models.Index(
+                fields=('group', 'pub_date'),
+                name='post_group_pub_date_idx',
+            ),
+            models.Index(
+                fields=('author', 'pub_date'),
+                name='post_author_pub_date_idx',
+            ),
+        )
         verbose_name = 'пост'
         verbose_name_plural = 'посты'
 
@@ -79,6 +159,13 @@ class Comment(models.Model):
     )
 
     class Meta:
+        indexes = (
+            models.Index(fields=('created',), name='comment_created_idx'),
+            models.Index(
+                fields=('post', 'created'),
+                name='comment_post_created_idx',
+            ),
+        )
         verbose_name = 'комментарий'
         verbose_name_plural = 'комментарии'
 
@@ -101,6 +188,12 @@ class Follow(models.Model):
     )
 
     class Meta:
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='follow_user_author_unique',
+            ),
+        )
         verbose_name = 'подписка'
         verbose_name_plural = 'подписки'
 
@@ -109,3 +202,210 @@ class Follow(models.Model):
             user=self.user.username,
             author=self.author.username,
         )
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='пост',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='автор',
+    )
+    pub_date = models.DateTimeField(verbose_name='дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        unique_together = ('user', 'post')
+        indexes = (
+            models.Index(
+                fields=('user', 'pub_date'),
+                name='timeline_user_pub_date_idx',
+            ),
+        )
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'записи ленты'
+
+    def __str__(self) -> str:
+        return TIMELINE_STRING.format(user=self.user_id, post=self.post_id)
+
+
+class AuthorStats(models.Model):
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='автор',
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='постов',
+        default=0,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='подписчиков',
+        default=0,
+        db_index=True,
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name='подписок',
+        default=0,
+    )
+    feed_pulled = models.BooleanField(
+        verbose_name='читается на лету',
+        default=False,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'статистика автора'
+        verbose_name_plural = 'статистика авторов'
+
+    def __str__(self) -> str:
+        return STATS_STRING.format(
+            author=self.author_id,
+            posts=self.posts_count,
+            followers=self.followers_count,
+            following=self.following_count,
+        )
+
+
+class PostCount(models.Model):
+    """Число постов в выборке posts.counters.
+
+    Сигналы записи постов меняют его одним UPDATE, кэш хранит только
+    копию для чтения.
+    """
+
+    scope = models.CharField(
+        verbose_name='выборка',
+        max_length=64,
+        primary_key=True,
+    )
+    count = models.PositiveIntegerField(
+        verbose_name='постов',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'счетчик постов'
+        verbose_name_plural = 'счетчики постов'
+
+    def __str__(self) -> str:
+        return POST_COUNT_STRING.format(scope=self.scope, count=self.count)
+
+
+class ThumbnailTask(models.Model):
+    """Пост, миниатюры которого ждут построения.
+
+    Неудачная попытка откладывает задачу на run_after, см.
+    posts.thumbnails.process.
+    """
+
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+        verbose_name='пост',
+    )
+    created = models.DateTimeField(
+        verbose_name='дата постановки',
+        auto_now_add=True,
+    )
+    run_after = models.DateTimeField(
+        verbose_name='выполнить не раньше',
+        default=timezone.now,
+        db_index=True,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='неудачных попыток',
+        default=0,
+    )
+
+    class Meta:
+        ordering = ('run_after',)
+        verbose_name = 'задача на миниатюры'
+        verbose_name_plural = 'задачи на миниатюры'
+
+    def __str__(self) -> str:
+        return THUMBNAIL_TASK_STRING.format(post=self.post_id)
+
+
+class ImageRelease(models.Model):
+    """Картинка, на которую не осталось ссылок, в очереди на удаление.
+
+    Файл удаляет команда purge_images не раньше IMAGE_RELEASE_GRACE
+    после освобождения, см. posts.signals.release_image.
+    """
+
+    name = models.CharField(
+        verbose_name='файл',
+        max_length=255,
+        primary_key=True,
+    )
+    released = models.DateTimeField(
+        verbose_name='дата освобождения',
+        auto_now=True,
+        db_index=True,
+    )
+
+    class Meta:
+        ordering = ('released',)
+        verbose_name = 'освобожденная картинка'
+        verbose_name_plural = 'освобожденные картинки'
+
+    def __str__(self) -> str:
+        return IMAGE_RELEASE_STRING.format(name=self.name)
+
+
+class SearchTextField(models.TextField):
+    """Столбец полнотекстового индекса, поддерживающий lookup match."""
+
+
+@SearchTextField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class PostSearch(models.Model):
+    """Строка FTS5-индекса posts_post_fts по тексту поста.
+
+    Таблицу создает миграция, а синхронизируют с posts_post триггеры,
+    поэтому модель только для чтения. rank — скрытый столбец FTS5 с
+    оценкой bm25, он доступен лишь в запросах с match.
+    """
+
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        related_name='search',
+        verbose_name='пост',
+    )
+    text = SearchTextField(verbose_name='текст')
+    rank = models.FloatField(verbose_name='релевантность')
+
+    class Meta:
+        managed = False
+        db_table = 'posts_post_fts'
+        verbose_name = 'поисковый индекс поста'
+        verbose_name_plural = 'поисковый индекс постов'
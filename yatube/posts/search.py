@@ -0,0 +1,210 @@
+import hashlib
+import re
+from functools import reduce
+from operator import and_
+from typing import List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q, QuerySet
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import SafeString, mark_safe
+
+from posts.models import Post, PostSearch
+from yatube.settings import (
+    SEARCH_CACHE_TIMEOUT,
+    SEARCH_MAX_RESULTS,
+    SEARCH_MAX_TERMS,
+    SEARCH_MIN_TERM_LENGTH,
+    SEARCH_SNIPPET_TOKENS,
+)
+
+TERM = re.compile(r'\w+')
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_END = '\x03'
+INDEX_TABLE = PostSearch._meta.db_table
+INDEX_STATEMENTS = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} USING fts5("
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {INDEX_TABLE}_ai AFTER INSERT "
+    "ON posts_post BEGIN "
+    f"INSERT INTO {INDEX_TABLE}(rowid, text) VALUES (new.id, new.text); "
+    "END",
+    f"CREATE TRIGGER IF NOT EXISTS {INDEX_TABLE}_ad AFTER DELETE "
+    "ON posts_post BEGIN "
+    f"INSERT INTO {INDEX_TABLE}({INDEX_TABLE}, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "END",
+    f"CREATE TRIGGER IF NOT EXISTS {INDEX_TABLE}_au AFTER UPDATE OF text "
+    "ON posts_post BEGIN "
+    f"INSERT INTO {INDEX_TABLE}({INDEX_TABLE}, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    f"INSERT INTO {INDEX_TABLE}(rowid, text) VALUES (new.id, new.text); "
+    "END",
+)
+
+
+class SearchUnavailable(Exception):
+    """Индекса нет, а искать полным просмотром таблицы запрещено."""
+
+
+def is_supported() -> bool:
+    """Есть ли у базы FTS5-индекс. Он создается только на SQLite."""
+    return connection.vendor == 'sqlite'
+
+
+def terms(query: str) -> list:
+    """Слова запроса в нижнем регистре, не больше SEARCH_MAX_TERMS.
+
+    Слова короче SEARCH_MIN_TERM_LENGTH отбрасываются: префикс из одной
+    буквы совпадает с большей частью индекса и стоит как его просмотр.
+    """
+    return [
+        term
+        for term in TERM.findall(query.lower())
+        if len(term) >= SEARCH_MIN_TERM_LENGTH
+    ][:SEARCH_MAX_TERMS]
+
+
+def match_expression(query: str) -> str:
+    """Безопасное выражение MATCH: все слова запроса как префиксы.
+
+    Каждое слово берется в кавычки, поэтому операторы FTS5 из
+    пользовательского ввода не интерпретируются.
+    """
+    return ' '.join(f'"{term}"*' for term in terms(query))
+
+
+def search(
+    query: str,
+    queryset: QuerySet = None,
+    allow_scan: bool = True,
+) -> QuerySet:
+    """Посты, содержащие все слова запроса, от самых релевантных.
+
+    Args:
+        query: строка поиска как ее ввел пользователь.
+        queryset: выборка, внутри которой искать; по умолчанию все посты.
+        allow_scan: можно ли без индекса искать через LIKE по всей
+            таблице. Публичные страницы передают False.
+
+    Returns:
+        QuerySet, отсортированный по bm25, при равенстве — от новых
+        к старым. Пустой, если в запросе нет ни одного слова.
+
+    Raises:
+        SearchUnavailable: индекса нет, а allow_scan=False.
+    """
+    if queryset is None:
+        queryset = Post.objects.all()
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none()
+    if not is_supported():
+        if not allow_scan:
+            raise SearchUnavailable
+        return queryset.filter(
+            reduce(and_, (Q(text__icontains=term) for term in terms(query))),
+        ).order_by('-pub_date', '-pk')
+    return queryset.filter(search__text__match=expression).order_by(
+        'search__rank',
+        '-pub_date',
+        '-pk',
+    )
+
+
+def ranked_results(
+    query: str,
+    group_id: Optional[int] = None,
+    author_id: Optional[int] = None,
+) -> List[Tuple[int, str]]:
+    """Лучшие SEARCH_MAX_RESULTS результатов поиска со сниппетами.
+
+    Список кэшируется на SEARCH_CACHE_TIMEOUT, так что популярный запрос
+    идет в индекс раз в этот интервал, а его страницы — только за
+    постами по первичному ключу.
+
+    Returns:
+        Пары (pk поста, сниппет) в порядке релевантности. В сниппете
+        совпадения обрамлены HIGHLIGHT_START и HIGHLIGHT_END.
+
+    Raises:
+        SearchUnavailable: на базе нет полнотекстового индекса.
+    """
+    expression = match_expression(query)
+    if not expression:
+        return []
+    if not is_supported():
+        raise SearchUnavailable
+    raw_key = f'{expression}|{group_id}|{author_id}'
+    key = 'posts:search:' + hashlib.md5(raw_key.encode()).hexdigest()
+    results = cache.get(key)
+    if results is None:
+        queryset = Post.objects.all()
+        if group_id:
+            queryset = queryset.filter(group_id=group_id)
+        if author_id:
+            queryset = queryset.filter(author_id=author_id)
+        results = list(
+            search(query, queryset, allow_scan=False)
+            .annotate(
+                snippet=RawSQL(
+                    f'snippet({INDEX_TABLE}, 0, %s, %s, %s, %s)',
+                    (
+                        HIGHLIGHT_START,
+                        HIGHLIGHT_END,
+                        '…',
+                        SEARCH_SNIPPET_TOKENS,
+                    ),
+                ),
+            )
+            .values_list('pk', 'snippet')[:SEARCH_MAX_RESULTS],
+        )
+        cache.set(key, results, SEARCH_CACHE_TIMEOUT)
+    return results
+
+
+def highlight(snippet: str) -> SafeString:
+    """Экранирует сниппет и превращает маркеры совпадений в <mark>."""
+    return mark_safe(
+        escape(snippet)
+        .replace(HIGHLIGHT_START, '<mark>')
+        .replace(HIGHLIGHT_END, '</mark>'),
+    )
+
+
+def load_posts(page_obj) -> None:
+    """Заменяет пары (pk, сниппет) страницы на сами посты.
+
+    Посты получают snippet с подсветкой и search_position — позицию
+    в выдаче, по которой строятся курсоры соседних страниц.
+    """
+    rows = list(page_obj.object_list)
+    posts = Post.objects.for_feed().in_bulk([pk for pk, _ in rows])
+    page_obj.object_list = []
+    for offset, (pk, snippet) in enumerate(rows):
+        post = posts.get(pk)
+        if post is None:
+            continue
+        post.snippet = highlight(snippet)
+        post.search_position = page_obj.offset + offset
+        page_obj.object_list.append(post)
+
+
+def rebuild() -> None:
+    """Пересоздает индекс и триггеры и заново индексирует все посты.
+
+    Нужна после восстановления базы из дампа и после миграций,
+    пересоздающих posts_post: SQLite удаляет триггеры вместе со
+    старой таблицей.
+    """
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        for statement in INDEX_STATEMENTS:
+            cursor.execute(statement)
+        cursor.execute(
+            f"INSERT INTO {INDEX_TABLE}({INDEX_TABLE}) VALUES ('rebuild')",
+        )
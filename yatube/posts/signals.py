@@ -0,0 +1,160 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from posts import counters, feed, follows, stats, uploads, versions
+from posts.models import (
+    AuthorStats,
+    Follow,
+    Group,
+    ImageRelease,
+    Post,
+    User,
+)
+
+AUTHOR_NAME_FIELDS = frozenset({'username', 'first_name', 'last_name'})
+
+
+def bump_post_versions(post, previous_group_id=None):
+    scopes = {versions.INDEX_SCOPE, versions.author_scope(post.author_id)}
+    for group_id in (post.group_id, previous_group_id):
+        if group_id:
+            scopes.add(versions.group_scope(group_id))
+    versions.bump(*scopes)
+
+
+def release_image(name):
+    """Ставит файл картинки в очередь на удаление, если ссылок на него нет.
+
+    Файлы в ContentAddressedStorage общие для одинаковых загрузок,
+    поэтому число ссылок — это число постов с таким image. Проверка
+    идет после коммита, чтобы откат не оставил пост без файла. Сам
+    файл удаляет purge_images через IMAGE_RELEASE_GRACE: одинаковая
+    загрузка в еще не закоммиченной транзакции уже ссылается на него.
+    """
+    if not name:
+        return
+
+    def release():
+        if not Post.objects.filter(image=name).exists():
+            ImageRelease.objects.update_or_create(name=name)
+
+    transaction.on_commit(release)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous(sender, instance, **kwargs):
+    instance._previous_group_id = None
+    instance._previous_image = ''
+    if instance.pk:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'image')
+            .first()
+        ) or (None, '')
+
+
+@receiver(pre_save, sender=Post)
+def fill_image_metadata(sender, instance, **kwargs):
+    """Записывает метаданные новой картинки, пока она еще загрузка."""
+    if not instance.image:
+        instance.image_width = instance.image_height = None
+        instance.image_size = None
+        instance.image_format = ''
+    elif not instance.image._committed:
+        metadata = uploads.read_metadata(instance.image.file) or {}
+        for field, value in metadata.items():
+            setattr(instance, field, value)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    bump_post_versions(
+        instance,
+        getattr(instance, '_previous_group_id', None),
+    )
+    if created:
+        counters.change_count(counters.INDEX_SCOPE, 1)
+        counters.change_count(counters.author_scope(instance.author_id), 1)
+        if instance.group_id:
+            counters.change_count(counters.group_scope(instance.group_id), 1)
+        stats.change(instance.author_id, posts_count=1)
+        feed.fan_out(instance)
+        return
+    previous_image = getattr(instance, '_previous_image', '')
+    if previous_image != instance.image.name:
+        release_image(previous_image)
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    if previous_group_id != instance.group_id:
+        if previous_group_id:
+            counters.change_count(counters.group_scope(previous_group_id), -1)
+        if instance.group_id:
+            counters.change_count(counters.group_scope(instance.group_id), 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    bump_post_versions(instance)
+    counters.change_count(counters.INDEX_SCOPE, -1)
+    counters.change_count(counters.author_scope(instance.author_id), -1)
+    if instance.group_id:
+        counters.change_count(counters.group_scope(instance.group_id), -1)
+    stats.change(instance.author_id, posts_count=-1)
+    release_image(instance.image.name)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        stats.change(instance.author_id, followers_count=1)
+        stats.change(instance.user_id, following_count=1)
+        feed.backfill(instance.user_id, instance.author_id)
+        versions.bump(
+            versions.follow_scope(instance.user_id),
+            versions.followers_scope(instance.author_id),
+        )
+        follows.forget(instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    stats.change(instance.author_id, followers_count=-1)
+    stats.change(instance.user_id, following_count=-1)
+    feed.prune(instance.user_id, instance.author_id)
+    versions.bump(
+        versions.follow_scope(instance.user_id),
+        versions.followers_scope(instance.author_id),
+    )
+    follows.forget(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Заводит статистику нового автора и сбрасывает версии при смене имени.
+
+    Имя автора выводится на карточках его постов, поэтому его смена
+    сбрасывает ленту, профиль и группы с его постами. Сохранение только
+    других полей (last_login при входе) версии не трогает.
+    """
+    if created:
+        AuthorStats.objects.get_or_create(author=instance)
+        return
+    if update_fields is not None and not AUTHOR_NAME_FIELDS.intersection(
+        update_fields
+    ):
+        return
+    group_ids = (
+        Post.objects.filter(author=instance, group__isnull=False)
+        .values_list('group_id', flat=True)
+        .distinct()
+    )
+    versions.bump(
+        versions.INDEX_SCOPE,
+        versions.author_scope(instance.pk),
+        *(versions.group_scope(group_id) for group_id in group_ids),
+    )
+
+
+@receiver(post_save, sender=Group)
+def bump_group_version(sender, instance, **kwargs):
+    versions.bump(versions.group_scope(instance.pk))
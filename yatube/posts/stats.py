@@ -0,0 +1,112 @@
+from django.db import transaction
+from django.db.models import Case, Count, F, Value, When
+from django.db.models.functions import Greatest
+
+from posts.models import AuthorStats, Follow, Post, User
+from yatube.settings import FEED_PUSH_FOLLOWERS_LIMIT
+
+
+def rebuild(author_id: int) -> AuthorStats:
+    """Пересчитывает статистику одного автора по исходным таблицам.
+
+    Флаг feed_pulled только ставится, но не снимается: см. change.
+    """
+    defaults = {
+        'posts_count': Post.objects.filter(author_id=author_id).count(),
+        'followers_count': Follow.objects.filter(
+            author_id=author_id,
+        ).count(),
+        'following_count': Follow.objects.filter(
+            user_id=author_id,
+        ).count(),
+    }
+    if defaults['followers_count'] > FEED_PUSH_FOLLOWERS_LIMIT:
+        defaults['feed_pulled'] = True
+    stats, _ = AuthorStats.objects.update_or_create(
+        author_id=author_id,
+        defaults=defaults,
+    )
+    return stats
+
+
+def rebuild_all() -> int:
+    """Пересчитывает статистику всех авторов тремя агрегатными запросами.
+
+    Returns:
+        Число пересчитанных записей.
+    """
+    posts = dict(
+        Post.objects.values_list('author_id')
+        .annotate(total=Count('pk'))
+        .order_by(),
+    )
+    followers = dict(
+        Follow.objects.values_list('author_id')
+        .annotate(total=Count('pk'))
+        .order_by(),
+    )
+    following = dict(
+        Follow.objects.values_list('user_id')
+        .annotate(total=Count('pk'))
+        .order_by(),
+    )
+    with transaction.atomic():
+        pulled = set(
+            AuthorStats.objects.filter(feed_pulled=True).values_list(
+                'author_id',
+                flat=True,
+            ),
+        )
+        AuthorStats.objects.all().delete()
+        created = AuthorStats.objects.bulk_create(
+            (
+                AuthorStats(
+                    author_id=pk,
+                    posts_count=posts.get(pk, 0),
+                    followers_count=followers.get(pk, 0),
+                    following_count=following.get(pk, 0),
+                    feed_pulled=(
+                        pk in pulled
+                        or followers.get(pk, 0) > FEED_PUSH_FOLLOWERS_LIMIT
+                    ),
+                )
+                for pk in User.objects.values_list('pk', flat=True).iterator()
+            ),
+            batch_size=500,
+        )
+    return len(created)
+
+
+def change(*author_ids: int, **deltas: int) -> None:
+    """Сдвигает счетчики авторов, например change(pk, posts_count=1).
+
+    Отсутствующие записи не создает: их пересчитает for_author при
+    первом чтении.
+
+    Когда followers_count переходит FEED_PUSH_FOLLOWERS_LIMIT, тот же
+    UPDATE ставит флаг feed_pulled. Обратно при отписках флаг не
+    снимается: посты, опубликованные, пока автор читался на лету, не
+    разложены по лентам, и без флага они из лент бы пропали. Флаг
+    снимает пересборка лент, см. feed.refresh_pulled_authors.
+    """
+    updates = {
+        field: Greatest(F(field) + delta, 0) for field, delta in deltas.items()
+    }
+    followers = deltas.get('followers_count', 0)
+    if followers > 0:
+        # Условие в SET видит счетчик до изменения.
+        updates['feed_pulled'] = Case(
+            When(
+                followers_count__gt=FEED_PUSH_FOLLOWERS_LIMIT - followers,
+                then=Value(True),
+            ),
+            default=F('feed_pulled'),
+        )
+    AuthorStats.objects.filter(author_id__in=author_ids).update(**updates)
+
+
+def for_author(author) -> AuthorStats:
+    try:
+        return author.stats
+    except AuthorStats.DoesNotExist:
+        return rebuild(author.pk)
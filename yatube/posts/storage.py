@@ -0,0 +1,104 @@
+import hashlib
+import os
+import re
+import time
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+HASH_CHUNK_SIZE = 64 * 1024
+PURGE_SUFFIX = '.purge'
+SHARDED_NAME = re.compile(
+    r'^(?P<directory>.*?)/?[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.\w+$',
+)
+
+
+def content_hash(content) -> str:
+    """sha256 содержимого файла, прочитанного по частям."""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def is_sharded(name: str) -> bool:
+    """Лежит ли файл уже в двухуровневом дереве по хэшу."""
+    return bool(SHARDED_NAME.match(name))
+
+
+def sharded_name(name: str, digest: str) -> str:
+    """Имя вида <каталог>/ab/cd/abcd….ext для файла с хэшем digest.
+
+    Каталог берется из name, так что upload_to продолжает работать,
+    а повторное сохранение уже разложенного файла не углубляет дерево.
+    """
+    match = SHARDED_NAME.match(name)
+    directory = match['directory'] if match else os.path.dirname(name)
+    extension = os.path.splitext(name)[1].lower()
+    return os.path.join(
+        directory,
+        digest[:2],
+        digest[2:4],
+        digest + extension,
+    )
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, в котором имя файла — хэш его содержимого.
+
+    Одинаковые загрузки получают одно имя и один файл, а значит и один
+    набор миниатюр sorl. Удалять такой файл можно, только когда на него
+    не ссылается ни одна запись, см. posts.signals.release_image.
+    Повторная загрузка уже лежащего файла обновляет его mtime, и по
+    нему delete_idle понимает, что файл снова в ходу.
+
+    Файлы раскладываются по двум уровням каталогов из первых символов
+    хэша, чтобы ни в одном каталоге не копились сотни тысяч файлов.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = sharded_name(name, content_hash(content))
+        if self.touch(name):
+            return name
+        return super().save(name, content, max_length)
+
+    def touch(self, name: str) -> bool:
+        """Обновляет mtime файла.
+
+        Returns:
+            False, если файла нет.
+        """
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def delete_idle(self, name: str, grace: float) -> bool:
+        """Удаляет файл, если его не загружали заново grace секунд.
+
+        Файл сначала атомарно переименовывается: параллельный save либо
+        успел обновить mtime, и тогда файл возвращается на место, либо
+        уже не находит его и пишет заново. Содержимое у одного имени
+        всегда одно, поэтому возврат поверх новой записи безопасен.
+
+        Returns:
+            False, если файл недавно загружали и он остался на месте.
+        """
+        path = self.path(name)
+        removed = path + PURGE_SUFFIX
+        try:
+            os.rename(path, removed)
+        except FileNotFoundError:
+            return True
+        if os.stat(removed).st_mtime > time.time() - grace:
+            os.replace(removed, path)
+            return False
+        os.remove(removed)
+        return True
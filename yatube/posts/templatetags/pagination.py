@@ -0,0 +1,15 @@
+from django import template
+
+from posts import utils
+
+register = template.Library()
+
+
+@register.filter
+def next_cursor(page_obj):
+    return utils.next_cursor(page_obj) or ''
+
+
+@register.filter
+def previous_cursor(page_obj):
+    return utils.previous_cursor(page_obj) or ''
@@ -0,0 +1,23 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def resolve_thumbnails(page_obj):
+    """Находит миниатюры всей страницы одним запросом к хранилищу.
+
+    Каждый пост с картинкой получает thumbnail_url, thumbnail_srcset
+    и thumbnail_webp_srcset для posts/includes/post_image.html.
+    """
+    thumbnails.resolve_posts(page_obj)
+    return ''
+
+
+@register.simple_tag
+def resolve_thumbnail(post):
+    """То же, что resolve_thumbnails, для одного поста."""
+    thumbnails.resolve_posts([post])
+    return ''
@@ -1,17 +1,28 @@
 from io import BytesIO
 
+from django.conf import settings
+from django.core.cache.backends.filebased import FileBasedCache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from PIL import Image
 
 
-def image(name: str = 'small.gif') -> SimpleUploadedFile:
+def image(
+    name: str = 'small.gif',
+    color: tuple = (155, 0, 0),
+) -> SimpleUploadedFile:
     file = BytesIO()
-    image = Image.new('RGBA', size=(50, 50), color=(155, 0, 0))
+    image = Image.new('RGBA', size=(50, 50), color=color)
     image.save(file, 'png')
     file.name = 'test.png'
     file.seek(0)
     return SimpleUploadedFile(
         name=name,
-        content=image,
+        content=file.getvalue(),
         content_type='image/gif',
     )
+
+
+def other_process_cache() -> FileBasedCache:
+    """Кэш так, как его видит другой процесс сервера или воркер."""
+    config = settings.CACHES['default']
+    return FileBasedCache(config['LOCATION'], config.get('OPTIONS', {}))
@@ -0,0 +1,36 @@
+import shutil
+import tempfile
+
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class IsolatedCacheRunner(DiscoverRunner):
+    """Запускает тесты с собственным пустым кэшем.
+
+    Кэш файловый, как и у сервера по умолчанию, чтобы тесты могли
+    открыть его второй раз, как другой процесс
+    (см. common.other_process_cache). Но он лежит во временном
+    каталоге: тесты не видят записи запущенного сервера и не стирают
+    их своими cache.clear().
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='yatube-cache-')
+        self.cache_settings = override_settings(
+            CACHES={
+                'default': {
+                    'BACKEND': (
+                        'django.core.cache.backends.filebased.FileBasedCache'
+                    ),
+                    'LOCATION': self.cache_dir,
+                },
+            },
+        )
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
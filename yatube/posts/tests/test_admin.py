@@ -0,0 +1,186 @@
+from unittest import mock
+
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.filters import SearchableListFilter
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='password',
+        )
+        cls.group = Group.objects.create(
+            title='Тест_группа',
+            slug='test_group',
+            description='test_description',
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        start = User.objects.count()
+        for number in range(start, start + count):
+            author = User.objects.create_user(username=f'author_{number}')
+            post = Post.objects.create(
+                author=author,
+                group=self.group,
+                text=f'Тест {number}',
+            )
+            Comment.objects.create(post=post, author=author, text='Тест')
+            Follow.objects.create(user=self.admin, author=author)
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_changelists_do_not_query_per_row(self):
+        """Число запросов списка в админке не растет с числом строк."""
+        for model in ('post', 'comment', 'follow'):
+            url = reverse(f'admin:posts_{model}_changelist')
+            with self.subTest(model=model):
+                self.add_rows(2)
+                self.client.get(url)
+                few = self.queries(url)
+                self.add_rows(5)
+                self.client.get(url)
+                self.assertEqual(self.queries(url), few)
+
+    def test_related_fields_use_autocomplete(self):
+        """Связи редактируются автодополнением, а не полным списком."""
+        self.add_rows(1)
+        other = Group.objects.create(title='Другая', slug='other')
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        form = response.context['cl'].formset.forms[0]
+        self.assertIsInstance(
+            form.fields['group'].widget.widget,
+            AutocompleteSelect,
+        )
+        self.assertNotContains(response, f'<option value="{other.pk}"')
+
+    def test_full_count_is_skipped(self):
+        """Без фильтров список берет число постов из счетчика."""
+        self.add_rows(3)
+        self.client.get(reverse('admin:posts_post_changelist'))
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse('admin:posts_post_changelist'))
+        counts = [
+            query['sql']
+            for query in context.captured_queries
+            if 'COUNT(' in query['sql'] and 'posts_post' in query['sql']
+        ]
+        self.assertEqual(counts, [])
+
+
+class AdminFilterTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='password',
+        )
+        cls.authors = [
+            User.objects.create_user(username=f'author_{number}')
+            for number in range(4)
+        ]
+        for number, author in enumerate(cls.authors):
+            for follower in cls.authors[:number]:
+                Follow.objects.create(user=follower, author=author)
+        cls.post = Post.objects.create(author=cls.authors[0], text='Тест')
+        cls.comment = Comment.objects.create(
+            post=cls.post,
+            author=cls.authors[0],
+            text='Тест',
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def choices(self, response):
+        return [
+            choice['display']
+            for spec in response.context['cl'].filter_specs
+            for choice in spec.choices(response.context['cl'])
+        ]
+
+    def test_author_filter_lists_top_authors(self):
+        """Без поиска показываются только самые популярные авторы."""
+        with mock.patch.object(SearchableListFilter, 'limit', 2):
+            response = self.client.get(
+                reverse('admin:posts_follow_changelist'),
+            )
+            choices = self.choices(response)
+        self.assertEqual(choices, ['Все', 'author_3', 'author_2'])
+
+    def test_author_filter_searches_by_prefix(self):
+        """Остальных авторов находит поиск по началу логина."""
+        response = self.client.get(
+            reverse('admin:posts_follow_changelist'),
+            {'author_q': 'author_1'},
+        )
+        self.assertEqual(self.choices(response), ['Все', 'author_1'])
+
+    def test_author_filter_filters_changelist(self):
+        """Выбранный автор ограничивает список и остается в панели."""
+        author = self.authors[1]
+        with mock.patch.object(SearchableListFilter, 'limit', 1):
+            response = self.client.get(
+                reverse('admin:posts_follow_changelist'),
+                {'author': author.pk},
+            )
+        self.assertEqual(
+            [follow.author for follow in response.context['cl'].result_list],
+            [author],
+        )
+        self.assertIn(author.username, self.choices(response))
+
+    def test_period_filter_filters_comments(self):
+        """Комментарии фильтруются по дню, месяцу и году."""
+        created = timezone.localtime(self.comment.created)
+        url = reverse('admin:posts_comment_changelist')
+        for value, expected in (
+            (created.strftime('%Y-%m-%d'), [self.comment]),
+            (created.strftime('%Y-%m'), [self.comment]),
+            (str(created.year), [self.comment]),
+            (str(created.year - 1), []),
+        ):
+            with self.subTest(value=value):
+                response = self.client.get(url, {'created': value})
+                self.assertEqual(
+                    list(response.context['cl'].result_list),
+                    expected,
+                )
+
+    def test_invalid_filter_value_is_rejected(self):
+        """Неразборчивое значение фильтра не доходит до базы."""
+        for model, params in (
+            ('follow', {'author': 'x'}),
+            ('comment', {'created': 'вчера'}),
+        ):
+            with self.subTest(model=model):
+                response = self.client.get(
+                    reverse(f'admin:posts_{model}_changelist'),
+                    params,
+                )
+                self.assertRedirects(
+                    response,
+                    reverse(f'admin:posts_{model}_changelist') + '?e=1',
+                    fetch_redirect_response=False,
+                )
@@ -0,0 +1,144 @@
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import versions
+from posts.models import Follow, Group, Post
+from posts.tests.common import other_process_cache
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тест_группа',
+            slug='test_group',
+            description='test_description',
+        )
+        Post.objects.create(author=cls.author, group=cls.group, text='Тест')
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.author}),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def revalidate(self, url, response, client=None):
+        return (client or self.client).get(
+            url,
+            HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+
+    def test_unchanged_page_returns_not_modified(self):
+        """Неизменившаяся страница отдается ответом 304."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.has_header('ETag'))
+                self.assertTrue(response.has_header('Last-Modified'))
+                self.assertEqual(
+                    self.revalidate(url, response).status_code,
+                    HTTPStatus.NOT_MODIFIED,
+                )
+
+    def test_index_revalidation_runs_no_queries(self):
+        """Проверка главной страницы обходится без запросов к базе."""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        with self.assertNumQueries(0):
+            self.revalidate(url, response)
+
+    def test_new_post_changes_validators(self):
+        """Новый пост делает прежний ETag недействительным."""
+        responses = [self.client.get(url) for url in self.urls]
+        Post.objects.create(author=self.author, group=self.group, text='Еще')
+        for url, response in zip(self.urls, responses):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.revalidate(url, response).status_code,
+                    HTTPStatus.OK,
+                )
+
+    def test_other_process_changes_validators(self):
+        """Версия, поднятая другим процессом, меняет ETag во всех."""
+        scopes = (
+            versions.INDEX_SCOPE,
+            versions.group_scope(self.group.pk),
+            versions.author_scope(self.author.pk),
+        )
+        for url, scope in zip(self.urls, scopes):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                with mock.patch('posts.versions.cache', other_process_cache()):
+                    versions.bump(scope)
+                self.assertEqual(
+                    self.revalidate(url, response).status_code,
+                    HTTPStatus.OK,
+                )
+
+    def test_validators_depend_on_viewer(self):
+        """ETag страницы гостя не подходит авторизованному читателю."""
+        reader_client = Client()
+        reader_client.force_login(self.reader)
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.assertEqual(
+            self.revalidate(url, response, reader_client).status_code,
+            HTTPStatus.OK,
+        )
+
+    def test_follow_changes_profile_validators(self):
+        """Подписка меняет ETag профиля автора."""
+        url = reverse('posts:profile', kwargs={'username': self.author})
+        response = self.client.get(url)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            self.revalidate(url, response).status_code,
+            HTTPStatus.OK,
+        )
+
+    def test_author_rename_changes_validators(self):
+        """Смена имени автора меняет ETag и фрагмент ленты с его постами."""
+        responses = [self.client.get(url) for url in self.urls]
+        self.author.first_name = 'Новое'
+        self.author.last_name = 'Имя'
+        self.author.save()
+        for url, response in zip(self.urls, responses):
+            with self.subTest(url=url):
+                response = self.revalidate(url, response)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertContains(response, 'Новое Имя')
+
+    def test_login_keeps_validators(self):
+        """Вход пользователя, меняющий только last_login, ETag не меняет."""
+        responses = [self.client.get(url) for url in self.urls]
+        Client().force_login(self.author)
+        for url, response in zip(self.urls, responses):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.revalidate(url, response).status_code,
+                    HTTPStatus.NOT_MODIFIED,
+                )
+
+    def test_missing_page_is_not_found(self):
+        """Для несуществующих группы и автора по-прежнему 404."""
+        for url in (
+            reverse('posts:group_list', kwargs={'slug': 'missing'}),
+            reverse('posts:profile', kwargs={'username': 'missing'}),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.client.get(url).status_code,
+                    HTTPStatus.NOT_FOUND,
+                )
@@ -0,0 +1,116 @@
+from contextlib import contextmanager
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from posts import counters
+from posts.models import Group, Post
+from posts.tests.common import other_process_cache
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тест_группа',
+            slug='test_group',
+            description='test_description',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_group',
+            description='test_description',
+        )
+        for num in range(3):
+            Post.objects.create(
+                author=cls.author,
+                group=cls.group,
+                text=f'Тест_текст {num}',
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_counts_are_served_from_cache(self):
+        """Повторное чтение счетчика не обращается к базе."""
+        self.assertEqual(counters.index_count(), 3)
+        self.assertEqual(counters.group_count(self.group), 3)
+        self.assertEqual(counters.author_count(self.author), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(counters.index_count(), 3)
+            self.assertEqual(counters.group_count(self.group), 3)
+            self.assertEqual(counters.author_count(self.author), 3)
+
+    @contextmanager
+    def assertNotCounted(self):
+        """Счетчики читаются без COUNT(*) по posts_post."""
+        with CaptureQueriesContext(connection) as context:
+            yield
+        self.assertFalse(
+            [
+                query['sql']
+                for query in context.captured_queries
+                if 'COUNT(' in query['sql']
+            ],
+        )
+
+    def test_writes_keep_counts_current(self):
+        """Создание, перенос и удаление поста обновляют счетчики."""
+        counters.index_count()
+        counters.group_count(self.group)
+        counters.group_count(self.other_group)
+        counters.author_count(self.author)
+        post = Post.objects.create(
+            author=self.author,
+            group=self.group,
+            text='Новый пост',
+        )
+        with self.assertNotCounted():
+            self.assertEqual(counters.index_count(), 4)
+            self.assertEqual(counters.group_count(self.group), 4)
+            self.assertEqual(counters.author_count(self.author), 4)
+        post.group = self.other_group
+        post.save()
+        with self.assertNotCounted():
+            self.assertEqual(counters.group_count(self.group), 3)
+            self.assertEqual(counters.group_count(self.other_group), 1)
+        post.delete()
+        with self.assertNotCounted():
+            self.assertEqual(counters.index_count(), 3)
+            self.assertEqual(counters.group_count(self.other_group), 0)
+            self.assertEqual(counters.author_count(self.author), 3)
+
+    def test_counts_are_kept_in_database(self):
+        """Изменения счетчика не теряются вместе с кэшем."""
+        counters.index_count()
+        with mock.patch('posts.counters.cache', other_process_cache()):
+            Post.objects.create(author=self.author, text='Пост')
+        Post.objects.create(author=self.author, text='Еще пост')
+        cache.clear()
+        with self.assertNotCounted():
+            self.assertEqual(counters.index_count(), 5)
+
+    def test_feed_count_sums_followed_authors(self):
+        """Счетчик ленты складывается из счетчиков авторов."""
+        another = User.objects.create_user(username='another')
+        Post.objects.create(author=another, text='Пост другого автора')
+        author_ids = [self.author.pk, another.pk]
+        self.assertEqual(counters.feed_count(author_ids), 4)
+        with self.assertNumQueries(0):
+            self.assertEqual(counters.feed_count(author_ids), 4)
+
+    def test_estimate_total_does_not_undercount(self):
+        """Оценка общего числа постов не меньше точного значения."""
+        self.assertGreaterEqual(
+            counters.estimate_total(),
+            Post.objects.count(),
+        )
@@ -0,0 +1,255 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import AuthorStats, Follow, Post, TimelineEntry
+from posts.utils import next_cursor
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Старый пост',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def follow(self):
+        self.reader_client.get(
+            reverse(
+                'posts:profile_follow',
+                kwargs={'username': self.author.username},
+            ),
+        )
+
+    def test_follow_backfills_timeline(self):
+        """Подписка переносит в ленту уже опубликованные посты."""
+        self.follow()
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.reader,
+                post=self.old_post,
+            ).exists(),
+        )
+
+    def test_new_post_is_fanned_out(self):
+        """Новый пост попадает в ленты подписчиков автора."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        entry = TimelineEntry.objects.get(user=self.reader, post=post)
+        self.assertEqual(entry.pub_date, post.pub_date)
+        self.assertEqual(entry.author, self.author)
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        self.follow()
+        self.reader_client.get(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': self.author.username},
+            ),
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists(),
+        )
+
+    def test_follow_index_reads_timeline(self):
+        """Лента подписок строится по материализованной ленте."""
+        self.follow()
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [new_post, self.old_post],
+        )
+
+
+class FollowFeedCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.another_reader = User.objects.create_user(username='another')
+        Post.objects.create(author=cls.author, text='Пост автора')
+        Post.objects.create(author=cls.other, text='Пост другого автора')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.url = reverse('posts:follow_index')
+
+    def get(self, client=None):
+        return (client or self.reader_client).get(self.url).content.decode()
+
+    def test_feed_fragment_is_cached_per_user(self):
+        """Каждый читатель получает свою закэшированную ленту."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.another_reader, author=self.other)
+        another_client = Client()
+        another_client.force_login(self.another_reader)
+        self.assertIn('Пост автора', self.get())
+        content = self.get(another_client)
+        self.assertIn('Пост другого автора', content)
+        self.assertNotIn('Пост автора', content)
+
+    def test_feed_fragment_is_served_from_cache(self):
+        """Без изменений лента отдается из кэша."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.get()
+        Post.objects.filter(author=self.author).update(text='Без сигналов')
+        self.assertIn('Пост автора', self.get())
+
+    def test_follow_and_unfollow_invalidate_feed(self):
+        """Подписка и отписка сразу меняют закэшированную ленту."""
+        self.assertNotIn('Пост автора', self.get())
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=(self.author.username,)),
+        )
+        self.assertIn('Пост автора', self.get())
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,)),
+        )
+        self.assertNotIn('Пост автора', self.get())
+
+    def test_cursor_pages_over_timeline(self):
+        """Курсор листает материализованную ленту в обе стороны."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        for num in range(12):
+            Post.objects.create(author=self.author, text=f'Пост {num}')
+        url = reverse('posts:follow_index')
+        first = self.reader_client.get(url).context['page_obj']
+        second = self.reader_client.get(
+            url,
+            {'cursor': next_cursor(first)},
+        ).context['page_obj']
+        self.assertEqual(
+            list(first) + list(second),
+            list(
+                Post.objects.filter(author=self.author).order_by(
+                    '-pub_date',
+                    '-pk',
+                ),
+            ),
+        )
+        back = self.reader_client.get(
+            url,
+            {'cursor': second.previous_cursor},
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+
+    def test_new_post_of_followed_author_invalidates_feed(self):
+        """Новый пост автора из подписок сразу виден в ленте."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.get()
+        Post.objects.create(author=self.author, text='Свежий пост')
+        self.assertIn('Свежий пост', self.get())
+
+
+class HybridFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.celebrity = User.objects.create_user(username='celebrity')
+        cls.author = User.objects.create_user(username='author')
+        cls.fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=cls.fan, author=cls.celebrity)
+
+    def setUp(self):
+        for module in ('feed', 'stats'):
+            limit = mock.patch(f'posts.{module}.FEED_PUSH_FOLLOWERS_LIMIT', 1)
+            limit.start()
+            self.addCleanup(limit.stop)
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        Follow.objects.create(user=self.reader, author=self.celebrity)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.posts = [
+            Post.objects.create(
+                author=self.celebrity if num % 3 else self.author,
+                text=f'Пост {num}',
+            )
+            for num in range(14)
+        ]
+        self.posts.reverse()
+
+    def test_popular_author_is_not_fanned_out(self):
+        """Посты автора с большим числом подписчиков не пишутся в ленты."""
+        self.assertFalse(
+            TimelineEntry.objects.filter(author=self.celebrity).exists(),
+        )
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.reader,
+                author=self.author,
+            ).exists(),
+        )
+
+    def test_follow_index_merges_pushed_and_pulled(self):
+        """Лента подписок сливает обе части в правильном порядке."""
+        url = reverse('posts:follow_index')
+        first = self.reader_client.get(url).context['page_obj']
+        self.assertEqual(list(first), self.posts[:10])
+        second = self.reader_client.get(url, {'page': 2}).context['page_obj']
+        self.assertEqual(list(second), self.posts[10:])
+
+    def test_cursor_pages_over_merged_feed(self):
+        """Курсорная пагинация работает поверх слитой ленты."""
+        url = reverse('posts:follow_index')
+        first = self.reader_client.get(url).context['page_obj']
+        second = self.reader_client.get(
+            url,
+            {'cursor': next_cursor(first)},
+        ).context['page_obj']
+        self.assertEqual(list(second), self.posts[10:])
+        self.assertFalse(second.has_next())
+
+    def test_author_under_limit_stays_pulled(self):
+        """Автор, ушедший под порог, читается на лету до пересборки."""
+        Follow.objects.filter(user=self.fan, author=self.celebrity).delete()
+        cache.clear()
+        self.assertTrue(
+            AuthorStats.objects.get(author=self.celebrity).feed_pulled,
+        )
+        page_obj = self.reader_client.get(
+            reverse('posts:follow_index'),
+        ).context['page_obj']
+        self.assertEqual(list(page_obj), self.posts[:10])
+
+    def test_rebuild_returns_author_to_timelines(self):
+        """Пересборка лент раскладывает посты автора, ушедшего под порог."""
+        Follow.objects.filter(user=self.fan, author=self.celebrity).delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertFalse(
+            AuthorStats.objects.get(author=self.celebrity).feed_pulled,
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(
+                user=self.reader,
+                author=self.celebrity,
+            ).count(),
+            Post.objects.filter(author=self.celebrity).count(),
+        )
+        page_obj = self.reader_client.get(
+            reverse('posts:follow_index'),
+        ).context['page_obj']
+        self.assertEqual(list(page_obj), self.posts[:10])
@@ -0,0 +1,320 @@
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import follows, versions
+from posts.models import AuthorStats, Follow, Post, TimelineEntry
+from posts.tests.common import other_process_cache
+
+User = get_user_model()
+
+
+class BulkFollowTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author_{num}')
+            for num in range(3)
+        ]
+        cls.posts = [
+            Post.objects.create(author=author, text='Тест_текст')
+            for author in cls.authors
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def stats(self, user):
+        stats = AuthorStats.objects.get(author=user)
+        return stats.followers_count, stats.following_count
+
+    def test_follow_pair_is_unique(self):
+        """Вторая подписка на того же автора не записывается."""
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.reader, author=self.authors[0])
+
+    def test_follow_many(self):
+        """Подписка пачкой обновляет статистику, ленту и версии."""
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        author_ids = [author.pk for author in self.authors]
+        version = versions.get_version(versions.follow_scope(self.reader.pk))
+        created = follows.follow_many(
+            self.reader,
+            author_ids + [self.reader.pk, 0],
+        )
+        self.assertEqual(created, author_ids[1:])
+        self.assertEqual(
+            set(self.reader.follower.values_list('author_id', flat=True)),
+            set(author_ids),
+        )
+        self.assertEqual(self.stats(self.reader), (0, 3))
+        for author in self.authors:
+            self.assertEqual(self.stats(author), (1, 0))
+        self.assertEqual(
+            set(
+                TimelineEntry.objects.filter(user=self.reader).values_list(
+                    'post_id',
+                    flat=True,
+                ),
+            ),
+            {post.pk for post in self.posts},
+        )
+        self.assertNotEqual(
+            versions.get_version(versions.follow_scope(self.reader.pk)),
+            version,
+        )
+
+    def test_follow_many_skips_existing(self):
+        """Повторная подписка пачкой ничего не меняет."""
+        author_ids = [author.pk for author in self.authors]
+        follows.follow_many(self.reader, author_ids)
+        self.assertEqual(follows.follow_many(self.reader, author_ids), [])
+        self.assertEqual(self.stats(self.reader), (0, 3))
+
+    def test_unfollow_many(self):
+        """Отписка пачкой удаляет подписки, записи ленты и счетчики."""
+        author_ids = [author.pk for author in self.authors]
+        follows.follow_many(self.reader, author_ids)
+        removed = follows.unfollow_many(self.reader, author_ids[:2] + [0])
+        self.assertEqual(removed, author_ids[:2])
+        self.assertEqual(
+            list(self.reader.follower.values_list('author_id', flat=True)),
+            author_ids[2:],
+        )
+        self.assertEqual(self.stats(self.reader), (0, 1))
+        self.assertEqual(self.stats(self.authors[0]), (0, 0))
+        self.assertEqual(
+            list(
+                TimelineEntry.objects.filter(user=self.reader).values_list(
+                    'author_id',
+                    flat=True,
+                ),
+            ),
+            author_ids[2:],
+        )
+
+    def before_statement(self, verb, action):
+        """Выполняет action перед первым запросом verb к posts_follow.
+
+        Так проверяется гонка с одиночной подпиской или отпиской,
+        успевшей записать строку между чтением и изменением пачки.
+        """
+        done = []
+
+        def wrapper(execute, sql, params, many, context):
+            if not done and sql.startswith(verb) and 'posts_follow' in sql:
+                done.append(sql)
+                action()
+            return execute(sql, params, many, context)
+
+        return connection.execute_wrapper(wrapper)
+
+    def test_follow_many_counts_concurrent_follow_once(self):
+        """Подписка, записанная параллельно, учитывается один раз."""
+        author = self.authors[0]
+        author_ids = [author.pk for author in self.authors]
+        with self.before_statement(
+            'INSERT',
+            lambda: Follow.objects.create(user=self.reader, author=author),
+        ):
+            created = follows.follow_many(self.reader, author_ids)
+        self.assertEqual(created, author_ids[1:])
+        self.assertEqual(self.stats(author), (1, 0))
+        self.assertEqual(self.stats(self.reader), (0, 3))
+
+    def test_unfollow_many_counts_concurrent_unfollow_once(self):
+        """Отписка, удаленная параллельно, учитывается один раз."""
+        author = self.authors[0]
+        Follow.objects.create(user=self.authors[1], author=author)
+        author_ids = [author.pk for author in self.authors]
+        follows.follow_many(self.reader, author_ids)
+        with self.before_statement(
+            'DELETE',
+            lambda: Follow.objects.filter(
+                user=self.reader,
+                author=author,
+            ).delete(),
+        ):
+            removed = follows.unfollow_many(self.reader, author_ids[:2])
+        self.assertEqual(removed, author_ids[1:2])
+        self.assertEqual(self.stats(author), (1, 0))
+        self.assertEqual(self.stats(self.reader), (0, 1))
+
+    def test_bulk_endpoint(self):
+        """Эндпоинт подписывает и отписывает по списку логинов."""
+        url = reverse('posts:follow_bulk')
+        usernames = [author.username for author in self.authors]
+        for action, expected in (('follow', 3), ('unfollow', 0)):
+            with self.subTest(action=action):
+                response = self.reader_client.post(
+                    url,
+                    {'action': action, 'authors': usernames},
+                )
+                self.assertRedirects(response, reverse('posts:follow_index'))
+                self.assertEqual(self.reader.follower.count(), expected)
+
+    def test_bulk_endpoint_rejects_bad_requests(self):
+        """Чужие логины, GET и слишком длинный список отклоняются."""
+        url = reverse('posts:follow_bulk')
+        self.assertEqual(
+            self.reader_client.get(url).status_code,
+            HTTPStatus.METHOD_NOT_ALLOWED,
+        )
+        with mock.patch('posts.forms.FOLLOW_BULK_LIMIT', 2):
+            for data in (
+                {'action': 'follow', 'authors': ['nobody']},
+                {'action': 'follow', 'authors': ['a', 'b', 'c']},
+                {'action': 'block', 'authors': [self.authors[0].username]},
+            ):
+                with self.subTest(data=data):
+                    response = self.reader_client.post(url, data)
+                    self.assertEqual(
+                        response.status_code,
+                        HTTPStatus.BAD_REQUEST,
+                    )
+        self.assertFalse(self.reader.follower.exists())
+
+
+class FollowingCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author_{num}')
+            for num in range(3)
+        ]
+        for author in cls.authors:
+            Post.objects.create(author=author, text='Тест_текст')
+        Follow.objects.create(user=cls.reader, author=cls.authors[0])
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_following_ids_are_cached(self):
+        """Множество подписок грузится одним запросом и дальше из кэша."""
+        with self.assertNumQueries(1):
+            ids = follows.following_ids(self.reader)
+        self.assertEqual(ids, {self.authors[0].pk})
+        with self.assertNumQueries(0):
+            self.assertEqual(follows.following_ids(self.reader), ids)
+
+    def test_anonymous_has_no_following(self):
+        """У анонима подписок нет и запроса за ними тоже."""
+        with self.assertNumQueries(0):
+            self.assertEqual(follows.following_ids(AnonymousUser()), set())
+
+    def test_follow_changes_reset_cache(self):
+        """Подписка и отписка, одиночные и пачкой, сбрасывают кэш."""
+        author = self.authors[1]
+        for change, expected in (
+            (
+                lambda: self.reader_client.get(
+                    reverse('posts:profile_follow', args=(author.username,)),
+                ),
+                True,
+            ),
+            (
+                lambda: self.reader_client.get(
+                    reverse(
+                        'posts:profile_unfollow',
+                        args=(author.username,),
+                    ),
+                ),
+                False,
+            ),
+            (lambda: follows.follow_many(self.reader, [author.pk]), True),
+            (lambda: follows.unfollow_many(self.reader, [author.pk]), False),
+        ):
+            follows.following_ids(self.reader)
+            change()
+            with self.subTest(following=expected):
+                self.assertIs(
+                    author.pk in follows.following_ids(self.reader),
+                    expected,
+                )
+
+    def test_follow_in_other_process_resets_cache(self):
+        """Подписка, сделанная другим процессом, видна и в этом."""
+        author = self.authors[1]
+        follows.following_ids(self.reader)
+        with mock.patch('posts.follows.cache', other_process_cache()):
+            follows.follow_many(self.reader, [author.pk])
+        self.assertIn(author.pk, follows.following_ids(self.reader))
+
+    def test_index_cards_show_follow_state(self):
+        """Кнопки на карточках главной отражают подписки читателя."""
+        follow_url = reverse(
+            'posts:profile_follow',
+            args=(self.authors[1].username,),
+        )
+        unfollow_url = reverse(
+            'posts:profile_unfollow',
+            args=(self.authors[0].username,),
+        )
+        follows.following_ids(self.reader)
+        with CaptureQueriesContext(connection) as context:
+            response = self.reader_client.get(reverse('posts:index'))
+        self.assertFalse(
+            [
+                query['sql']
+                for query in context.captured_queries
+                if 'posts_follow' in query['sql']
+            ],
+        )
+        self.assertContains(response, unfollow_url)
+        self.assertContains(response, follow_url)
+        self.reader_client.get(follow_url)
+        response = self.reader_client.get(reverse('posts:index'))
+        self.assertNotContains(response, follow_url)
+        anonymous = self.client.get(reverse('posts:index'))
+        self.assertNotContains(anonymous, unfollow_url)
+        self.assertNotContains(anonymous, follow_url)
+
+    def test_index_fragment_is_shared_by_same_follows(self):
+        """Читатели без постов с одинаковыми подписками делят фрагмент."""
+        other = User.objects.create_user(username='other_reader')
+        Follow.objects.create(user=other, author=self.authors[0])
+        self.reader_client.get(reverse('posts:index'))
+        other_client = Client()
+        other_client.force_login(other)
+        with CaptureQueriesContext(connection) as context:
+            other_client.get(reverse('posts:index'))
+        self.assertFalse(
+            [
+                query['sql']
+                for query in context.captured_queries
+                if 'ORDER BY "posts_post"."pub_date"' in query['sql']
+            ],
+        )
+
+    def test_author_gets_no_button_on_own_posts(self):
+        """Автор с теми же подписками не видит кнопку у своих постов."""
+        author = self.authors[1]
+        Follow.objects.create(user=author, author=self.authors[0])
+        self.reader_client.get(reverse('posts:index'))
+        author_client = Client()
+        author_client.force_login(author)
+        response = author_client.get(reverse('posts:index'))
+        self.assertNotContains(
+            response,
+            reverse('posts:profile_follow', args=(author.username,)),
+        )
+        self.assertContains(
+            self.reader_client.get(reverse('posts:index')),
+            reverse('posts:profile_follow', args=(author.username,)),
+        )
@@ -0,0 +1,135 @@
+from types import SimpleNamespace
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import feed
+from posts.models import Comment, Follow, Group, Post, TimelineEntry, User
+from posts.utils import NEXT, encode_cursor
+
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN — SQLite')
+class ViewQueryPlanTests(TestCase):
+    """Запросы страниц идут по составным индексам без досортировки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тест_группа',
+            slug='test_group',
+            description='test_description',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            group=cls.group,
+            text='Тестовый пост',
+        )
+        cls.comment = Comment.objects.create(
+            post=cls.post,
+            author=cls.reader,
+            text='Тест',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def plans(self, url, params=None):
+        """Планы всех запросов страницы, упорядочивающих выборку."""
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url, params)
+        plans = {}
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or 'ORDER BY' not in sql:
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plans[sql] = ' | '.join(row[-1] for row in cursor.fetchall())
+        return plans
+
+    def test_view_queries_use_indexes(self):
+        """Каждый запрос страницы читается по индексу без TEMP B-TREE."""
+        posts_cursor = {
+            'cursor': encode_cursor(self.post, 2, NEXT, 'pub_date'),
+        }
+        comments_cursor = {
+            'cursor': encode_cursor(self.comment, 2, NEXT, 'created'),
+        }
+        entry = TimelineEntry.objects.get(user=self.reader)
+        timeline_cursor = {
+            'cursor': encode_cursor(
+                SimpleNamespace(
+                    **{
+                        feed.TIMELINE_FIELD: entry.pub_date,
+                        feed.TIMELINE_TIEBREAK: entry.pk,
+                    },
+                ),
+                2,
+                NEXT,
+                feed.TIMELINE_FIELD,
+                feed.TIMELINE_TIEBREAK,
+            ),
+        }
+        group = reverse('posts:group_list', args=(self.group.slug,))
+        profile = reverse('posts:profile', args=(self.author.username,))
+        for url, params, index in (
+            (reverse('posts:index'), None, 'post_pub_date_idx'),
+            (reverse('posts:index'), posts_cursor, 'post_pub_date_idx'),
+            (group, None, 'post_group_pub_date_idx'),
+            (group, posts_cursor, 'post_group_pub_date_idx'),
+            (profile, None, 'post_author_pub_date_idx'),
+            (profile, posts_cursor, 'post_author_pub_date_idx'),
+            (
+                reverse('posts:post_detail', args=(self.post.pk,)),
+                None,
+                'comment_post_created_idx',
+            ),
+            (
+                reverse('posts:post_comments', args=(self.post.pk,)),
+                comments_cursor,
+                'comment_post_created_idx',
+            ),
+            (
+                reverse('posts:follow_index'),
+                None,
+                'timeline_user_pub_date_idx',
+            ),
+            (
+                reverse('posts:follow_index'),
+                timeline_cursor,
+                'timeline_user_pub_date_idx',
+            ),
+        ):
+            with self.subTest(url=url, params=params):
+                plans = self.plans(url, params)
+                self.assertTrue(
+                    any(index in plan for plan in plans.values()),
+                    plans,
+                )
+                for sql, plan in plans.items():
+                    self.assertNotIn(TEMP_SORT, plan, sql)
+
+    def test_follow_lookups_use_index(self):
+        """Подписки читаются по уникальному индексу (user, author)."""
+        for queryset in (
+            Follow.objects.filter(user=self.reader, author=self.author),
+            Follow.objects.filter(user=self.reader).values_list('author_id'),
+        ):
+            with self.subTest(sql=str(queryset.query)):
+                # SQLite строит индекс ограничения сам и называет его
+                # sqlite_autoindex_*, поэтому проверяется вид поиска.
+                self.assertIn(
+                    'SEARCH posts_follow USING COVERING INDEX',
+                    queryset.explain(),
+                )
@@ -0,0 +1,270 @@
+import difflib
+import json
+import os
+import re
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from posts.urls import urlpatterns
+
+User = get_user_model()
+
+SQL_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+# Имя точки сохранения содержит id потока и счетчик транзакций.
+SAVEPOINT_NAME = re.compile(r'"s\d+_x\d+"')
+# Снимок запросов каждой страницы для диффа при превышении бюджета.
+# Обновляется запуском теста с UPDATE_QUERY_SHAPES=1.
+SHAPES_FILE = Path(__file__).with_name('query_shapes.json')
+UPDATE_SHAPES = 'UPDATE_QUERY_SHAPES'
+
+
+def query_shape(sql: str) -> str:
+    """Приводит SQL к виду без литералов, чтобы сравнивать запросы."""
+    return SQL_LITERAL.sub('?', SAVEPOINT_NAME.sub('"s?"', sql))
+
+
+def shapes_diff(expected, shapes) -> str:
+    """Дифф между снимком запросов страницы и выполненными.
+
+    Строки с «+» — запросы, которых в снимке не было, с «-» — пропавшие.
+    Пустая строка — запросы совпали со снимком.
+    """
+    return '\n'.join(
+        difflib.unified_diff(
+            expected,
+            shapes,
+            SHAPES_FILE.name,
+            'выполненные запросы',
+            lineterm='',
+        ),
+    )
+
+
+class QueryBudgetTests(TestCase):
+    """Бюджет SQL-запросов на каждую страницу из posts/urls.py.
+
+    Бюджет задан парой (число запросов, суммарное время SQL в мс) и
+    проверяется на холодном кэше, то есть для худшего случая. Дифф
+    выполненных запросов со снимком SHAPES_FILE попадает в сообщение
+    о превышении бюджета.
+    """
+
+    budgets = {
+        'index': (2, 50),
+        'group_list': (4, 50),
+        'profile': (6, 50),
+        'search': (2, 50),
+        'post_detail': (4, 50),
+        'post_comments': (2, 50),
+        'post_create': (3, 50),
+        'post_edit': (5, 50),
+        'add_comment': (3, 50),
+        'follow_index': (6, 50),
+        'follow_bulk': (13, 50),
+        'profile_follow': (12, 50),
+        'profile_unfollow': (9, 50),
+    }
+
+    @classmethod
+    def post_data(cls):
+        """Тела POST-запросов для страниц, которые принимают только POST."""
+        return {
+            'follow_bulk': {
+                'action': 'follow',
+                'authors': [author.username for author in cls.authors],
+            },
+        }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author_{num}',
+                first_name='Имя',
+                last_name=f'Фамилия {num}',
+            )
+            for num in range(5)
+        ]
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {num}',
+                slug=f'group_{num}',
+                description='Описание',
+            )
+            for num in range(3)
+        ]
+        for author in cls.authors[1:]:
+            Follow.objects.create(user=cls.reader, author=author)
+        for num in range(60):
+            Post.objects.create(
+                author=cls.authors[num % 5],
+                group=cls.groups[num % 3] if num % 4 else None,
+                text=f'Тестовый пост {num}',
+            )
+        cls.post = Post.objects.filter(author=cls.authors[0]).first()
+        for num in range(15):
+            Comment.objects.create(
+                post=cls.post,
+                author=cls.authors[num % 5],
+                text=f'Комментарий {num}',
+            )
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.authors[0])
+
+    def urls(self):
+        author = self.authors[0].username
+        return (
+            ('index', reverse('posts:index'), self.client),
+            (
+                'group_list',
+                reverse('posts:group_list', args=(self.groups[0].slug,)),
+                self.client,
+            ),
+            (
+                'profile',
+                reverse('posts:profile', args=(author,)),
+                self.reader_client,
+            ),
+            (
+                'search',
+                reverse('posts:search') + '?q=Тестовый',
+                self.client,
+            ),
+            (
+                'post_detail',
+                reverse('posts:post_detail', args=(self.post.pk,)),
+                self.reader_client,
+            ),
+            (
+                'post_comments',
+                reverse('posts:post_comments', args=(self.post.pk,)),
+                self.client,
+            ),
+            ('post_create', reverse('posts:post_create'), self.author_client),
+            (
+                'post_edit',
+                reverse('posts:post_edit', args=(self.post.pk,)),
+                self.author_client,
+            ),
+            (
+                'add_comment',
+                reverse('posts:add_comment', args=(self.post.pk,)),
+                self.reader_client,
+            ),
+            (
+                'follow_index',
+                reverse('posts:follow_index'),
+                self.reader_client,
+            ),
+            (
+                'follow_bulk',
+                reverse('posts:follow_bulk'),
+                self.reader_client,
+            ),
+            (
+                'profile_follow',
+                reverse('posts:profile_follow', args=(author,)),
+                self.reader_client,
+            ),
+            (
+                'profile_unfollow',
+                reverse('posts:profile_unfollow', args=(author,)),
+                self.reader_client,
+            ),
+        )
+
+    def test_every_url_has_budget(self):
+        """Для каждой страницы приложения задан бюджет."""
+        names = {pattern.name for pattern in urlpatterns}
+        self.assertEqual({name for name, _, _ in self.urls()}, names)
+        self.assertEqual(set(self.budgets), names)
+
+    def assert_within_budget(self, name, shapes, elapsed, expected):
+        """Проверяет бюджет страницы name.
+
+        Запросы, разошедшиеся со снимком, сами по себе не ошибка: дифф
+        со снимком нужен, чтобы видеть, какие запросы вывели страницу
+        за бюджет.
+        """
+        max_queries, max_time = self.budgets[name]
+        diff = shapes_diff(expected, shapes)
+        self.assertLessEqual(
+            len(shapes),
+            max_queries,
+            f'{name}: {len(shapes)} запросов при бюджете '
+            f'{max_queries}\n{diff}',
+        )
+        self.assertLessEqual(
+            elapsed,
+            max_time,
+            f'{name}: SQL занял {elapsed:.1f} мс при бюджете '
+            f'{max_time} мс\n{diff}',
+        )
+
+    def test_changed_queries_within_budget_pass(self):
+        """Другие запросы в пределах бюджета не роняют проверку."""
+        self.assert_within_budget(
+            'index',
+            ['SELECT ? FROM "posts_group"'],
+            0,
+            ['SELECT ? FROM "posts_post"'],
+        )
+
+    def test_exceeded_budget_reports_diff(self):
+        """Превышение бюджета сообщает дифф запросов со снимком."""
+        shapes = ['SELECT ? FROM "posts_post"'] * 2
+        shapes.append('SELECT ? FROM "posts_group"')
+        with self.assertRaisesMessage(
+            AssertionError,
+            '+SELECT ? FROM "posts_group"',
+        ):
+            self.assert_within_budget('index', shapes, 0, shapes[:2])
+
+    def test_query_budgets(self):
+        """Страницы укладываются в бюджет; снимок обновляется по флагу."""
+        post_data = self.post_data()
+        update = bool(os.environ.get(UPDATE_SHAPES))
+        expected = {}
+        if SHAPES_FILE.exists():
+            expected = json.loads(SHAPES_FILE.read_text(encoding='utf-8'))
+        executed = {}
+        for name, url, client in self.urls():
+            with self.subTest(url=url):
+                cache.clear()
+                with CaptureQueriesContext(connection) as context:
+                    if name in post_data:
+                        client.post(url, post_data[name])
+                    else:
+                        client.get(url)
+                shapes = [
+                    query_shape(query['sql'])
+                    for query in context.captured_queries
+                ]
+                executed[name] = shapes
+                elapsed = 1000 * sum(
+                    float(query['time']) for query in context.captured_queries
+                )
+                self.assert_within_budget(
+                    name,
+                    shapes,
+                    elapsed,
+                    expected.get(name, []),
+                )
+        if update:
+            SHAPES_FILE.write_text(
+                json.dumps(executed, ensure_ascii=False, indent=2) + '\n',
+                encoding='utf-8',
+            )
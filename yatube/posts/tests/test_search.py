@@ -0,0 +1,216 @@
+from http import HTTPStatus
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import search
+from posts.models import Group, Post, User
+from posts.utils import next_cursor, previous_cursor
+
+
+class SearchIndexTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.once = Post.objects.create(
+            author=cls.author,
+            text='Кот сидит на окне',
+        )
+        cls.twice = Post.objects.create(
+            author=cls.author,
+            text='Кот и еще раз кот',
+        )
+        cls.other = Post.objects.create(
+            author=cls.author,
+            text='Собака лает',
+        )
+
+    def test_results_are_ranked(self):
+        """Чаще встречающееся слово поднимает пост выше."""
+        self.assertEqual(
+            list(search.search('кот')),
+            [self.twice, self.once],
+        )
+
+    def test_all_terms_and_prefixes_match(self):
+        """Ищутся все слова запроса, каждое — как префикс."""
+        self.assertEqual(list(search.search('ко окн')), [self.once])
+        self.assertEqual(list(search.search('собак')), [self.other])
+
+    def test_index_follows_writes(self):
+        """Триггеры держат индекс в актуальном состоянии."""
+        post = Post.objects.create(author=self.author, text='Попугай')
+        self.assertEqual(list(search.search('попугай')), [post])
+        post.text = 'Хомяк'
+        post.save()
+        self.assertFalse(search.search('попугай').exists())
+        self.assertEqual(list(search.search('хомяк')), [post])
+        Post.objects.filter(pk=post.pk).update(text='Черепаха')
+        self.assertEqual(list(search.search('черепаха')), [post])
+        post.delete()
+        self.assertFalse(search.search('черепаха').exists())
+
+    def test_query_syntax_is_not_interpreted(self):
+        """Операторы FTS5 во вводе пользователя не ломают запрос."""
+        for query in ('кот OR собака', '"кот', 'NEAR(кот', 'кот*', '-кот'):
+            with self.subTest(query=query):
+                list(search.search(query))
+        self.assertFalse(search.search('кот OR собака').exists())
+        self.assertFalse(search.search('!!!').exists())
+
+    def test_rebuild_restores_index(self):
+        """rebuild_search_index восстанавливает удаленные триггеры."""
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER posts_post_fts_ai')
+        Post.objects.create(author=self.author, text='Попугай')
+        self.assertFalse(search.search('попугай').exists())
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertTrue(search.search('попугай').exists())
+        post = Post.objects.create(author=self.author, text='Хомяк')
+        self.assertEqual(list(search.search('хомяк')), [post])
+
+    def test_admin_uses_index(self):
+        """Поиск в админке идет по индексу и сортируется по релевантности."""
+        admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@example.com',
+            password='password',
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'),
+            {'q': 'кот'},
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list),
+            [self.twice, self.once],
+        )
+
+
+class SearchViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тест_группа',
+            slug='test_group',
+            description='test_description',
+        )
+        Post.objects.bulk_create(
+            Post(
+                author=cls.author if number % 2 else cls.other,
+                group=cls.group if number % 3 else None,
+                text=f'Кот номер {number}' + ' кот' * (number % 4),
+            )
+            for number in range(25)
+        )
+        cls.url = reverse('posts:search')
+
+    def setUp(self):
+        cache.clear()
+
+    def pages(self, params):
+        """Все страницы выдачи, пройденные по ссылке «Следующая»."""
+        posts, cursor = [], None
+        while True:
+            response = self.client.get(
+                self.url,
+                {**params, 'cursor': cursor} if cursor else params,
+            )
+            page_obj = response.context['page_obj']
+            posts.extend(page_obj)
+            if not page_obj.has_next():
+                return posts
+            cursor = next_cursor(page_obj)
+
+    def test_results_are_ranked_and_paginated(self):
+        """Курсор проходит всю выдачу в порядке релевантности."""
+        posts = self.pages({'q': 'кот'})
+        self.assertEqual(
+            [post.pk for post in posts],
+            [post.pk for post in search.search('кот')],
+        )
+
+    def test_previous_page_cursor(self):
+        """Курсор «Предыдущая» возвращает на ту же страницу."""
+        first = self.client.get(self.url, {'q': 'кот'}).context['page_obj']
+        second = self.client.get(
+            self.url,
+            {'q': 'кот', 'cursor': next_cursor(first)},
+        ).context['page_obj']
+        back = self.client.get(
+            self.url,
+            {'q': 'кот', 'cursor': previous_cursor(second)},
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+        self.assertEqual(back.number, 1)
+
+    def test_filters_by_group_and_author(self):
+        """Выдачу можно сузить до группы и автора."""
+        posts = self.pages(
+            {'q': 'кот', 'group': self.group.slug, 'author': 'author'},
+        )
+        self.assertTrue(posts)
+        for post in posts:
+            self.assertEqual(post.group_id, self.group.pk)
+            self.assertEqual(post.author_id, self.author.pk)
+        response = self.client.get(self.url, {'q': 'кот', 'group': 'nope'})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_snippet_is_highlighted_and_escaped(self):
+        """Совпадения подсвечиваются, а текст поста экранируется."""
+        Post.objects.create(
+            author=self.author,
+            text='<script>alert(1)</script> попугай',
+        )
+        response = self.client.get(self.url, {'q': 'попугай'})
+        self.assertContains(response, '<mark>попугай</mark>')
+        self.assertNotContains(response, '<script>alert')
+
+    def test_popular_query_is_cached(self):
+        """Повторный запрос берет выдачу из кэша, не трогая индекс."""
+        self.client.get(self.url, {'q': 'кот'})
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.url, {'q': 'кот'})
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertNotIn('MATCH', context.captured_queries[0]['sql'])
+
+    def test_never_scans_posts_table(self):
+        """Поиск идет через индекс даже с фильтрами, без LIKE и SCAN."""
+        queryset = search.search(
+            'кот',
+            Post.objects.filter(group=self.group, author=self.author),
+            allow_scan=False,
+        )
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertNotRegex(plan, r'SCAN (TABLE )?posts_post\b(?!_fts)')
+        self.assertNotIn('LIKE', sql)
+
+    def test_without_index_view_refuses_to_scan(self):
+        """Без индекса страница отвечает 503, а не ищет по LIKE."""
+        with mock.patch.object(search, 'is_supported', return_value=False):
+            response = self.client.get(self.url, {'q': 'кот'})
+            self.assertEqual(
+                response.status_code,
+                HTTPStatus.SERVICE_UNAVAILABLE,
+            )
+            with self.assertRaises(search.SearchUnavailable):
+                search.search('кот', allow_scan=False)
+
+    def test_short_terms_are_ignored(self):
+        """Слова короче SEARCH_MIN_TERM_LENGTH не уходят в индекс."""
+        response = self.client.get(self.url, {'q': 'к'})
+        self.assertEqual(list(response.context['page_obj']), [])
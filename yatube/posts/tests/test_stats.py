@@ -0,0 +1,65 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import AuthorStats, Follow, Post
+
+User = get_user_model()
+
+
+class AuthorStatsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        cache.clear()
+
+    def assert_stats(self, user, posts, followers, following):
+        stats = AuthorStats.objects.get(author=user)
+        self.assertEqual(
+            (stats.posts_count, stats.followers_count, stats.following_count),
+            (posts, followers, following),
+        )
+
+    def test_signals_keep_stats_current(self):
+        """Посты и подписки обновляют статистику авторов."""
+        post = Post.objects.create(author=self.author, text='Тест_текст')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assert_stats(self.author, 1, 1, 0)
+        self.assert_stats(self.reader, 0, 0, 1)
+        post.delete()
+        follow.delete()
+        self.assert_stats(self.author, 0, 0, 0)
+        self.assert_stats(self.reader, 0, 0, 0)
+
+    def test_rebuild_command_fixes_drift(self):
+        """Команда rebuild_author_stats исправляет расхождения."""
+        Post.objects.create(author=self.author, text='Тест_текст')
+        Follow.objects.create(user=self.reader, author=self.author)
+        AuthorStats.objects.update(
+            posts_count=10,
+            followers_count=10,
+            following_count=10,
+        )
+        call_command('rebuild_author_stats', stdout=StringIO())
+        self.assert_stats(self.author, 1, 1, 0)
+        self.assert_stats(self.reader, 0, 0, 1)
+
+    def test_profile_reads_precomputed_stats(self):
+        """Профиль берет счетчики из статистики, а не из агрегатов."""
+        Post.objects.create(author=self.author, text='Тест_текст')
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = Client().get(
+            reverse('posts:profile', kwargs={'username': self.author}),
+        )
+        stats = response.context['stats']
+        self.assertEqual(stats.posts_count, 1)
+        self.assertEqual(stats.followers_count, 1)
+        self.assertContains(response, 'Подписчиков: 1')
@@ -0,0 +1,160 @@
+import datetime
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from posts import thumbnails
+from posts.models import ImageRelease, Post, ThumbnailTask, User
+from posts.storage import is_sharded, sharded_name
+from posts.tests.common import image
+from yatube.settings import IMAGE_RELEASE_GRACE
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def run_on_commit(func):
+    func()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@mock.patch('posts.signals.transaction.on_commit', run_on_commit)
+class ContentAddressedStorageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create(self, name='small.gif'):
+        return Post.objects.create(
+            author=self.author,
+            text='Тест',
+            image=image(name),
+        )
+
+    def test_identical_uploads_share_file(self):
+        """Одинаковые загрузки получают одно имя и один файл."""
+        first, second = self.create('one.gif'), self.create('two.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(
+            first.image.name,
+            r'^posts/([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}\.gif$',
+        )
+        self.assertEqual(first.image.path, second.image.path)
+
+    def test_identical_uploads_share_thumbnails(self):
+        """Миниатюры строятся один раз на одинаковое содержимое."""
+        first, second = self.create(), self.create()
+        thumbnails.generate(first.pk)
+        self.assertIsNotNone(thumbnails.ready_thumbnail(second.image))
+
+    def purge(self, *args):
+        call_command('purge_images', *args, stdout=StringIO())
+
+    def age(self, name):
+        """Делает освобождение и сам файл старше IMAGE_RELEASE_GRACE."""
+        past = timezone.now() - datetime.timedelta(
+            seconds=IMAGE_RELEASE_GRACE + 60,
+        )
+        ImageRelease.objects.filter(name=name).update(released=past)
+        path = Post._meta.get_field('image').storage.path(name)
+        os.utime(path, (past.timestamp(), past.timestamp()))
+
+    def test_file_is_kept_while_referenced(self):
+        """Файл удаляется только после последней ссылки на него."""
+        first, second = self.create(), self.create()
+        storage = first.image.storage
+        name = first.image.name
+        first.delete()
+        self.purge('--grace', '0')
+        self.assertTrue(storage.exists(name))
+        second.delete()
+        self.assertTrue(storage.exists(name))
+        self.purge('--grace', '0')
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(ImageRelease.objects.exists())
+
+    def test_replaced_image_is_released(self):
+        """Замененная картинка поста удаляется, если на нее нет ссылок."""
+        post = self.create()
+        storage = post.image.storage
+        name = post.image.name
+        other = self.create()
+        other.image = ''
+        other.save()
+        self.purge('--grace', '0')
+        self.assertTrue(storage.exists(name))
+        post.image = ''
+        post.save()
+        self.purge('--grace', '0')
+        self.assertFalse(storage.exists(name))
+
+    def test_released_file_waits_for_grace_period(self):
+        """Освобожденный файл удаляется не раньше IMAGE_RELEASE_GRACE."""
+        post = self.create()
+        storage = post.image.storage
+        name = post.image.name
+        post.delete()
+        self.purge()
+        self.assertTrue(storage.exists(name))
+        self.age(name)
+        self.purge()
+        self.assertFalse(storage.exists(name))
+
+    def test_reupload_during_release_keeps_file(self):
+        """Одинаковая загрузка до удаления файла не остается без него."""
+        post = self.create()
+        storage = post.image.storage
+        name = post.image.name
+        post.delete()
+        self.age(name)
+        # Загрузка уже сохранила файл, но ее пост еще не закоммичен.
+        self.assertEqual(storage.save('posts/again.gif', image()), name)
+        self.purge()
+        self.assertTrue(storage.exists(name))
+        Post.objects.create(author=self.author, text='Тест', image=name)
+        self.age(name)
+        self.purge()
+        self.assertTrue(storage.exists(name))
+        self.assertFalse(ImageRelease.objects.exists())
+
+    def test_sharded_name_keeps_upload_directory(self):
+        """Повторное сохранение разложенного файла не углубляет дерево."""
+        digest = 'ab' * 32
+        name = sharded_name('posts/photo.JPG', digest)
+        self.assertEqual(name, f'posts/ab/ab/{digest}.jpg')
+        self.assertEqual(sharded_name(name, digest), name)
+        self.assertTrue(is_sharded(name))
+        self.assertFalse(is_sharded('posts/photo.jpg'))
+
+    def test_shard_media_moves_legacy_files(self):
+        """shard_media переносит старые файлы и обновляет записи."""
+        legacy = FileSystemStorage().save('posts/legacy.gif', image())
+        posts = [
+            Post.objects.create(author=self.author, text='Тест', image=legacy)
+            for _ in range(2)
+        ]
+        sharded = self.create()
+        call_command('shard_media', '--batch-size=1', stdout=StringIO())
+        storage = sharded.image.storage
+        for post in posts:
+            post.refresh_from_db()
+            self.assertEqual(post.image.name, sharded.image.name)
+        self.assertFalse(storage.exists(legacy))
+        self.assertTrue(storage.exists(sharded.image.name))
+        self.assertEqual(
+            set(ThumbnailTask.objects.values_list('post_id', flat=True)),
+            {post.pk for post in posts},
+        )
@@ -0,0 +1,292 @@
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.core.paginator import Paginator
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore
+
+from posts import thumbnails, versions
+from posts.forms import PostForm
+from posts.models import Post, ThumbnailTask, User
+from posts.tests.common import image, other_process_cache
+from yatube.settings import (
+    POST_IMAGE_WIDTHS,
+    THUMBNAIL_MAX_ATTEMPTS,
+    THUMBNAIL_MISS_TIMEOUT,
+)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.author,
+            text='Тест',
+            image=image(),
+        )
+
+    def kvstore_cache(self, backend):
+        """Подменяет кэш хранилища sorl, как у процесса-воркера."""
+        return mock.patch.object(
+            KVStore,
+            'cache',
+            new_callable=mock.PropertyMock,
+            return_value=backend,
+        )
+
+    def test_page_falls_back_to_original_until_ready(self):
+        """Пока миниатюры нет, страница получает оригинал без обработки."""
+        with mock.patch.object(
+            thumbnails.default.backend,
+            'get_thumbnail',
+        ) as get_thumbnail:
+            thumbnails.resolve_posts([self.post])
+        self.assertEqual(self.post.thumbnail_url, self.post.image.url)
+        self.assertEqual(self.post.thumbnail_srcset, '')
+        get_thumbnail.assert_not_called()
+
+    def test_generate_makes_thumbnail_ready(self):
+        """После фоновой генерации страница получает миниатюру."""
+        thumbnails.generate(self.post.pk)
+        thumbnail = thumbnails.ready_thumbnail(self.post.image)
+        self.assertIsNotNone(thumbnail)
+        self.assertTrue(thumbnail.exists())
+        thumbnails.resolve_posts([self.post])
+        self.assertEqual(self.post.thumbnail_url, thumbnail.url)
+
+    def test_thumbnail_from_other_process_is_seen(self):
+        """Миниатюру, построенную воркером, видят процессы сервера."""
+        thumbnails.resolve_posts([self.post])
+        worker_cache = other_process_cache()
+        with self.kvstore_cache(worker_cache), mock.patch(
+            'posts.versions.cache',
+            worker_cache,
+        ):
+            thumbnails.generate(self.post.pk)
+        self.assertIsNotNone(thumbnails.ready_thumbnail(self.post.image))
+
+    def test_missing_thumbnail_is_cached_briefly(self):
+        """Отсутствие миниатюры перепроверяется по базе через минуту."""
+        thumbnails.resolve_posts([self.post])
+        with self.kvstore_cache(LocMemCache('lost', {})):
+            thumbnails.generate(self.post.pk)
+        self.assertIsNone(thumbnails.ready_thumbnail(self.post.image))
+        later = time.time() + THUMBNAIL_MISS_TIMEOUT + 1
+        with mock.patch('time.time', return_value=later):
+            self.assertIsNotNone(
+                thumbnails.ready_thumbnail(self.post.image),
+            )
+
+    def test_generate_bumps_post_versions(self):
+        """Готовая миниатюра сбрасывает закэшированные фрагменты страниц."""
+        before = versions.get_version(versions.INDEX_SCOPE)
+        with mock.patch('time.time', return_value=before + 1):
+            thumbnails.generate(self.post.pk)
+        self.assertNotEqual(
+            versions.get_version(versions.INDEX_SCOPE),
+            before,
+        )
+
+    def test_schedule_queues_task_once(self):
+        """Повторная постановка поста в очередь не дублирует задачу."""
+        thumbnails.schedule(self.post)
+        thumbnails.schedule(self.post)
+        self.assertEqual(
+            list(ThumbnailTask.objects.values_list('post_id', flat=True)),
+            [self.post.pk],
+        )
+
+    def test_worker_drains_queue(self):
+        """Команда generate_thumbnails строит миниатюры и чистит очередь."""
+        thumbnails.schedule(self.post)
+        call_command('generate_thumbnails', '--once', stdout=StringIO())
+        self.assertFalse(ThumbnailTask.objects.exists())
+        self.assertIsNotNone(thumbnails.ready_thumbnail(self.post.image))
+
+    def test_task_scheduled_during_generation_is_kept(self):
+        """Постановка в очередь во время генерации не теряется."""
+        thumbnails.schedule(self.post)
+        with mock.patch.object(
+            thumbnails,
+            'generate',
+            side_effect=lambda post_id: thumbnails.schedule(self.post),
+        ):
+            self.assertEqual(thumbnails.process(10), 1)
+        self.assertTrue(
+            ThumbnailTask.objects.filter(post_id=self.post.pk).exists(),
+        )
+
+    def test_task_claimed_by_other_worker_is_skipped(self):
+        """Задачу, которую уже забрал другой воркер, не выполняют."""
+        other = Post.objects.create(author=self.author, text='Тест')
+        thumbnails.schedule(self.post)
+        ThumbnailTask.objects.create(post=other)
+        generated = []
+
+        def generate(post_id):
+            generated.append(post_id)
+            ThumbnailTask.objects.filter(post=other).delete()
+
+        with mock.patch.object(thumbnails, 'generate', side_effect=generate):
+            self.assertEqual(thumbnails.process(10), 1)
+        self.assertEqual(generated, [self.post.pk])
+
+    def test_failed_task_is_retried_later(self):
+        """Сбой построения откладывает задачу, а не теряет ее."""
+        thumbnails.schedule(self.post)
+        with mock.patch.object(
+            thumbnails,
+            'build',
+            side_effect=OSError,
+        ), self.assertLogs(thumbnails.logger, 'ERROR'):
+            self.assertEqual(thumbnails.process(10), 0)
+        task = ThumbnailTask.objects.get(post_id=self.post.pk)
+        self.assertEqual(task.attempts, 1)
+        self.assertGreater(task.run_after, timezone.now())
+        self.assertEqual(thumbnails.process(10), 0)
+        ThumbnailTask.objects.update(run_after=timezone.now())
+        self.assertEqual(thumbnails.process(10), 1)
+        self.assertFalse(ThumbnailTask.objects.exists())
+        self.assertIsNotNone(thumbnails.ready_thumbnail(self.post.image))
+
+    def test_task_is_dropped_after_last_attempt(self):
+        """После THUMBNAIL_MAX_ATTEMPTS неудач задача снимается."""
+        ThumbnailTask.objects.create(
+            post=self.post,
+            attempts=THUMBNAIL_MAX_ATTEMPTS - 1,
+        )
+        with mock.patch.object(
+            thumbnails,
+            'build',
+            side_effect=OSError,
+        ), self.assertLogs(thumbnails.logger, 'ERROR'):
+            self.assertEqual(thumbnails.process(10), 0)
+        self.assertFalse(ThumbnailTask.objects.exists())
+
+    def test_form_schedules_new_image_only(self):
+        """Форма ставит миниатюру в очередь, только если картинка новая."""
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            form = PostForm(data={'text': 'Тест'}, files={'image': image()})
+            self.assertTrue(form.is_valid(), form.errors)
+            post = form.save(commit=False)
+            post.author = self.author
+            post.save()
+            schedule.assert_not_called()
+            form = PostForm(
+                data={'text': 'Новый текст'},
+                instance=self.post,
+            )
+            self.assertTrue(form.is_valid(), form.errors)
+            form.save()
+            schedule.assert_not_called()
+            form = PostForm(
+                data={'text': 'Тест'},
+                files={'image': image('other.gif')},
+                instance=self.post,
+            )
+            self.assertTrue(form.is_valid(), form.errors)
+            form.save()
+        schedule.assert_called_once_with(self.post)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PageThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(
+                author=cls.author,
+                text=f'Тест {number}',
+                image=image(color=(number, 0, 0)),
+            )
+            for number in range(5)
+        )
+        Post.objects.create(author=cls.author, text='Без картинки')
+        cls.ready = Post.objects.filter(image__gt='').first()
+        thumbnails.generate(cls.ready.pk)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def page(self):
+        return Paginator(Post.objects.order_by('pk'), 10).get_page(1)
+
+    def test_page_is_resolved_with_single_lookup(self):
+        """Миниатюры всей страницы находятся одним запросом."""
+        first, second = list(self.page()), list(self.page())
+        with self.assertNumQueries(1):
+            thumbnails.resolve_posts(first)
+        with self.assertNumQueries(0):
+            thumbnails.resolve_posts(second)
+
+    def test_page_gets_thumbnail_or_original_urls(self):
+        """Готовая миниатюра подставляется, остальным — оригинал."""
+        page_obj = self.page()
+        thumbnails.resolve_posts(page_obj)
+        widths = sorted(POST_IMAGE_WIDTHS)
+        for post in page_obj:
+            with self.subTest(post=post.pk):
+                if not post.image:
+                    self.assertFalse(hasattr(post, 'thumbnail_url'))
+                elif post.pk == self.ready.pk:
+                    self.assertEqual(
+                        post.thumbnail_url,
+                        thumbnails.ready_thumbnail(post.image).url,
+                    )
+                    self.assertEqual(
+                        [
+                            item.split()[-1]
+                            for item in post.thumbnail_srcset.split(', ')
+                        ],
+                        [f'{width}w' for width in widths],
+                    )
+                else:
+                    self.assertEqual(post.thumbnail_url, post.image.url)
+
+    def test_generate_builds_every_variant(self):
+        """Генерация строит миниатюры всех ширин и форматов."""
+        ready = thumbnails.ready_thumbnails([self.ready.image])
+        variants = ready[self.ready.image.name]
+        self.assertEqual(set(variants), set(thumbnails.variants()))
+        for variant, thumbnail in variants.items():
+            with self.subTest(variant=variant):
+                self.assertEqual(thumbnail.width, variant.width)
+
+    def test_webp_variants_follow_pillow_support(self):
+        """WebP-варианты строятся, только если Pillow умеет WebP."""
+        for supported in (True, False):
+            with self.subTest(supported=supported), mock.patch.object(
+                thumbnails.features,
+                'check',
+                return_value=supported,
+            ):
+                formats = {variant.format for variant in thumbnails.variants()}
+                self.assertEqual(thumbnails.WEBP in formats, supported)
@@ -0,0 +1,237 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+from PIL.JpegImagePlugin import JpegImageFile
+
+from posts import thumbnails, uploads
+from posts.forms import PostForm
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+ORIENTATION = 0x0112
+DESCRIPTION = 0x010E
+# Pillow вкладывает профиль в файл как есть, не разбирая его.
+ICC_PROFILE = b'test-icc-profile'
+
+
+def jpeg(size, name='photo.jpg'):
+    file = BytesIO()
+    Image.new('RGB', size=size, color=(155, 0, 0)).save(file, 'jpeg')
+    return SimpleUploadedFile(
+        name=name,
+        content=file.getvalue(),
+        content_type='image/jpeg',
+    )
+
+
+def upload(image, image_format, name, content_type, **params):
+    file = BytesIO()
+    image.save(file, image_format, **params)
+    return SimpleUploadedFile(
+        name=name,
+        content=file.getvalue(),
+        content_type=content_type,
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class UploadLimitsTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def form(self, upload):
+        return PostForm(data={'text': 'Тест'}, files={'image': upload})
+
+    def test_too_large_file_is_rejected(self):
+        """Файл больше POST_IMAGE_MAX_BYTES не проходит валидацию."""
+        with mock.patch.object(uploads, 'POST_IMAGE_MAX_BYTES', 10):
+            form = self.form(jpeg((20, 20)))
+            self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors.as_data()['image'][0].code,
+            'file_too_large',
+        )
+
+    def test_too_many_pixels_are_rejected_before_decoding(self):
+        """Слишком большая картинка отклоняется без декодирования."""
+        form = self.form(jpeg((20, 20)))
+        with mock.patch.object(
+            uploads,
+            'POST_IMAGE_MAX_PIXELS',
+            100,
+        ), mock.patch.object(Image.Image, 'load') as load:
+            self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors.as_data()['image'][0].code,
+            'too_many_pixels',
+        )
+        load.assert_not_called()
+
+    def test_small_image_is_kept(self):
+        """Картинка в пределах лимитов сохраняется как есть."""
+        upload = jpeg((40, 30))
+        form = self.form(upload)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertIs(form.cleaned_data['image'], upload)
+
+    def test_oversized_image_is_downscaled(self):
+        """Оригинал больше POST_IMAGE_MAX_SIDE уменьшается с draft."""
+        form = self.form(jpeg((800, 400)))
+        draft = JpegImageFile.draft
+        with mock.patch.object(
+            uploads,
+            'POST_IMAGE_MAX_SIDE',
+            100,
+        ), mock.patch.object(
+            JpegImageFile,
+            'draft',
+            autospec=True,
+            side_effect=draft,
+        ) as spy:
+            self.assertTrue(form.is_valid(), form.errors)
+        spy.assert_called()
+        image = form.cleaned_data['image']
+        self.assertEqual(image.image.size, (100, 50))
+        with Image.open(image.temporary_file_path()) as saved:
+            self.assertEqual(saved.format, 'JPEG')
+            self.assertEqual(saved.size, (100, 50))
+
+    def test_palette_and_bilevel_images_are_downscaled(self):
+        """Картинки с палитрой и 1-битные тоже уменьшаются."""
+        palette = Image.new('RGB', (800, 400), (155, 0, 0)).convert('P')
+        transparent = palette.copy()
+        transparent.info['transparency'] = 0
+        for source, image_format, content_type in (
+            (palette, 'GIF', 'image/gif'),
+            (transparent, 'PNG', 'image/png'),
+            (Image.new('1', (800, 400), 1), 'PNG', 'image/png'),
+            (Image.new('1', (800, 400), 1), 'BMP', 'image/bmp'),
+        ):
+            with self.subTest(mode=source.mode, format=image_format):
+                form = self.form(
+                    upload(
+                        source,
+                        image_format,
+                        f'picture.{image_format.lower()}',
+                        content_type,
+                    ),
+                )
+                with mock.patch.object(uploads, 'POST_IMAGE_MAX_SIDE', 100):
+                    self.assertTrue(form.is_valid(), form.errors)
+                image = form.cleaned_data['image']
+                with Image.open(image.temporary_file_path()) as saved:
+                    self.assertEqual(saved.format, image_format)
+                    self.assertEqual(saved.size, (100, 50))
+
+    def test_exif_orientation_is_applied(self):
+        """Повернутое по EXIF фото уменьшается уже в нужной ориентации."""
+        exif = Image.Exif()
+        exif[ORIENTATION] = 6
+        exif[DESCRIPTION] = 'test'
+        form = self.form(
+            upload(
+                Image.new('RGB', (800, 400), (155, 0, 0)),
+                'JPEG',
+                'photo.jpg',
+                'image/jpeg',
+                exif=exif.tobytes(),
+                icc_profile=ICC_PROFILE,
+            ),
+        )
+        with mock.patch.object(uploads, 'POST_IMAGE_MAX_SIDE', 100):
+            self.assertTrue(form.is_valid(), form.errors)
+        image = form.cleaned_data['image']
+        self.assertEqual(image.image.size, (50, 100))
+        with Image.open(image.temporary_file_path()) as saved:
+            self.assertEqual(saved.size, (50, 100))
+            self.assertNotIn(ORIENTATION, saved.getexif())
+            self.assertEqual(saved.getexif()[DESCRIPTION], 'test')
+            self.assertEqual(saved.info['icc_profile'], ICC_PROFILE)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageMetadataTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_metadata_is_stored_on_upload(self):
+        """Размеры, объем и формат записываются при загрузке."""
+        upload = jpeg((40, 30))
+        post = Post.objects.create(
+            author=self.author,
+            text='Тест',
+            image=upload,
+        )
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (40, 30))
+        self.assertEqual(post.image_size, upload.size)
+        self.assertEqual(post.image_format, 'JPEG')
+        post.image = ''
+        post.save()
+        post.refresh_from_db()
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_format, '')
+
+    def test_backfill_fills_legacy_posts(self):
+        """backfill_image_metadata дописывает метаданные старым постам."""
+        name = FileSystemStorage().save('posts/legacy.jpg', jpeg((40, 30)))
+        post = Post.objects.create(author=self.author, text='Тест', image=name)
+        self.assertIsNone(post.image_width)
+        call_command('backfill_image_metadata', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (40, 30))
+        self.assertEqual(post.image_format, 'JPEG')
+
+    def test_original_is_decoded_once_for_all_variants(self):
+        """Все варианты миниатюр строятся из одного чтения оригинала."""
+        post = Post.objects.create(
+            author=self.author,
+            text='Тест',
+            image=jpeg((400, 300)),
+        )
+        engine = thumbnails.default.engine
+        with mock.patch.object(
+            engine,
+            'get_image',
+            wraps=engine.get_image,
+        ) as get_image:
+            thumbnails.build(post)
+        get_image.assert_called_once()
+        ready = thumbnails.ready_thumbnails([post.image])[post.image.name]
+        self.assertEqual(set(ready), set(thumbnails.variants()))
+
+    def test_fallback_uses_stored_dimensions(self):
+        """Без миниатюры размеры берутся из полей поста, а не из файла."""
+        post = Post.objects.create(
+            author=self.author,
+            text='Тест',
+            image=jpeg((40, 30), name='fallback.jpg'),
+        )
+        post = Post.objects.for_feed().get(pk=post.pk)
+        with mock.patch.object(
+            post.image.storage,
+            'open',
+            side_effect=AssertionError,
+        ):
+            thumbnails.resolve_posts([post])
+        self.assertEqual(
+            (post.thumbnail_width, post.thumbnail_height),
+            (40, 30),
+        )
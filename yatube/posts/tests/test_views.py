@@ -1,12 +1,20 @@
 from http import HTTPStatus
+from unittest import mock
 
 from django import forms
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
 
-from posts.models import Follow, Group, Post
+from posts import versions
+from posts.models import Comment, Follow, Group, Post
+from posts.tests.common import other_process_cache
+from posts.utils import next_cursor
 
 User = get_user_model()
 
@@ -124,6 +132,7 @@ class PaginatorViewsTest(TestCase):
             )
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
@@ -148,6 +157,240 @@ class PaginatorViewsTest(TestCase):
             self.assertEqual(len(response.context['page_obj']), 3)
 
 
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='Test_user')
+        cls.group = Group.objects.create(
+            title='Тест_группа',
+            slug='test_group',
+            description='test_description',
+        )
+        for num in range(13):
+            cls.post = Post.objects.create(
+                author=cls.user,
+                group=cls.group,
+                text=f'Тест_текст {num}',
+            )
+        for num in range(3):
+            Comment.objects.create(
+                post=cls.post,
+                author=cls.user,
+                text=f'Комментарий {num}',
+            )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user.username}),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_next_cursor_continues_first_page(self):
+        """Курсор «дальше» ведет на вторую страницу без повторов."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.client.get(url).context['page_obj']
+                second = self.client.get(
+                    url,
+                    {'cursor': next_cursor(first)},
+                ).context['page_obj']
+                self.assertEqual(second.number, 2)
+                self.assertEqual(len(second), 3)
+                self.assertFalse(second.has_next())
+                self.assertFalse(set(first) & set(second))
+                self.assertEqual(
+                    list(first) + list(second),
+                    list(Post.objects.order_by('-pub_date', '-pk')),
+                )
+
+    def test_numbered_pages_are_ordered_like_cursor(self):
+        """Страницы по номеру упорядочены по той же паре, что и курсор."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as context:
+                    self.client.get(url)
+                self.assertTrue(
+                    [
+                        query['sql']
+                        for query in context.captured_queries
+                        if 'ORDER BY "posts_post"."pub_date" DESC, '
+                        '"posts_post"."id" DESC' in query['sql']
+                    ],
+                )
+
+    def test_previous_cursor_returns_first_page(self):
+        """Курсор «назад» возвращает на первую страницу."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.client.get(url).context['page_obj']
+                second = self.client.get(
+                    url,
+                    {'cursor': next_cursor(first)},
+                ).context['page_obj']
+                back = self.client.get(
+                    url,
+                    {'cursor': second.previous_cursor},
+                ).context['page_obj']
+                self.assertEqual(back.number, 1)
+                self.assertFalse(back.has_previous())
+                self.assertEqual(list(back), list(first))
+
+    def test_broken_cursor_opens_first_page(self):
+        """Поврежденный курсор открывает первую страницу."""
+        comments_url = reverse('posts:post_comments', args=(self.post.pk,))
+        for url, name, size in (
+            (self.urls[0], 'page_obj', 10),
+            (self.urls[2], 'page_obj', 10),
+            (comments_url, 'comments', 3),
+        ):
+            for raw in (
+                'broken',
+                'n|2|5|garbage',
+                'n|2|5|',
+                'n|2|5|2021-02-30T10:00:00',
+            ):
+                with self.subTest(url=url, cursor=raw):
+                    response = self.client.get(
+                        url,
+                        {
+                            'cursor': urlsafe_base64_encode(
+                                force_bytes(raw),
+                            ),
+                        },
+                    )
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+                    page_obj = response.context[name]
+                    self.assertEqual(page_obj.number, 1)
+                    self.assertEqual(len(page_obj), size)
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тест_группа',
+            slug='test_group',
+            description='test_description',
+        )
+        cls.authors = [
+            User.objects.create_user(
+                username=f'author_{num}',
+                first_name='Имя',
+                last_name=f'Фамилия {num}',
+            )
+            for num in range(3)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        for num in range(12):
+            Post.objects.create(
+                author=cls.authors[num % 3],
+                group=cls.group,
+                text=f'Тест_текст {num}',
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_list_views_query_count(self):
+        """Число запросов страницы не зависит от числа карточек."""
+        views = (
+            (reverse('posts:index'), self.client, 2),
+            (
+                reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+                self.client,
+                4,
+            ),
+            (
+                reverse(
+                    'posts:profile',
+                    kwargs={'username': self.authors[0].username},
+                ),
+                self.client,
+                3,
+            ),
+            (reverse('posts:follow_index'), self.reader_client, 6),
+        )
+        for url, client, queries in views:
+            with self.subTest(url=url):
+                cache.clear()
+                with self.assertNumQueries(queries):
+                    client.get(url)
+
+
+class CommentsViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = [
+            User.objects.create_user(username=f'user_{num}')
+            for num in range(5)
+        ]
+        cls.post = Post.objects.create(author=cls.users[0], text='Тест')
+        for num in range(25):
+            Comment.objects.create(
+                post=cls.post,
+                author=cls.users[num % 5],
+                text=f'Комментарий {num}',
+            )
+
+    def test_post_detail_shows_first_comments_page(self):
+        """На странице поста первая страница комментариев с авторами."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'pk': self.post.pk}),
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 20)
+        self.assertTrue(comments.has_next())
+        self.assertEqual(comments[0].text, 'Комментарий 24')
+        self.assertContains(response, 'Комментарий 5')
+        self.assertNotContains(response, 'Комментарий 4<')
+
+    def test_comments_fragment_loads_next_page(self):
+        """Фрагмент отдает следующую страницу без страницы поста."""
+        first = self.client.get(
+            reverse('posts:post_detail', kwargs={'pk': self.post.pk}),
+        ).context['comments']
+        url = reverse('posts:post_comments', kwargs={'pk': self.post.pk})
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'cursor': first.next_cursor})
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertTemplateNotUsed(response, 'posts/post_detail.html')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            [f'Комментарий {num}' for num in range(4, -1, -1)],
+        )
+
+    def test_more_comments_link_opens_post_page(self):
+        """Ссылка «Еще комментарии» ведет на страницу поста, а не фрагмент."""
+        detail_url = reverse('posts:post_detail', kwargs={'pk': self.post.pk})
+        first = self.client.get(detail_url).context['comments']
+        self.assertContains(
+            self.client.get(detail_url),
+            f'href="{detail_url}?cursor={first.next_cursor}#comments"',
+        )
+        response = self.client.get(detail_url, {'cursor': first.next_cursor})
+        self.assertTemplateUsed(response, 'posts/post_detail.html')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            [f'Комментарий {num}' for num in range(4, -1, -1)],
+        )
+
+    def test_comments_fragment_missing_post(self):
+        """Фрагмент комментариев несуществующего поста отдает 404."""
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'pk': self.post.pk + 1}),
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
 class PostCreateTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -208,13 +451,39 @@ class CashTests(TestCase):
         )
         response = self.client.get(reverse('posts:index'))
         self.assertContains(response, test_post.text)
-        test_post.delete()
+        Post.objects.filter(pk=test_post.pk).update(text='Без сигналов')
         response = self.client.get(reverse('posts:index'))
         self.assertContains(response, test_post.text)
         cache.clear()
         response = self.client.get(reverse('posts:index'))
         self.assertNotContains(response, test_post.text)
 
+    def test_index_cache_invalidated_by_post_changes(self):
+        """Создание, правка и удаление поста сразу видны на главной."""
+        author = User.objects.create_user(username='author')
+        self.client.get(reverse('posts:index'))
+        test_post = Post.objects.create(author=author, text='Новый пост')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Новый пост')
+        test_post.text = 'Исправленный пост'
+        test_post.save()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Исправленный пост')
+        test_post.delete()
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Исправленный пост')
+
+    def test_index_cache_sees_other_processes(self):
+        """Версию главной, поднятую другим процессом, видят все процессы."""
+        author = User.objects.create_user(username='author')
+        test_post = Post.objects.create(author=author, text='Тест_текст')
+        self.client.get(reverse('posts:index'))
+        Post.objects.filter(pk=test_post.pk).update(text='Без сигналов')
+        with mock.patch('posts.versions.cache', other_process_cache()):
+            versions.bump(versions.INDEX_SCOPE)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Без сигналов')
+
 
 class FollowTests(TestCase):
     @classmethod
@@ -0,0 +1,350 @@
+import logging
+from datetime import timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from django.utils import timezone
+from PIL import features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore
+
+from posts.models import Post, ThumbnailTask
+from posts.signals import bump_post_versions
+from yatube.settings import (
+    POST_IMAGE_WIDTHS,
+    THUMBNAIL_MAX_ATTEMPTS,
+    THUMBNAIL_MISS_TIMEOUT,
+    THUMBNAIL_RETRY_DELAY,
+)
+
+logger = logging.getLogger(__name__)
+
+POST_THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+POST_THUMBNAIL_RATIO = 339 / 960
+WEBP = 'WEBP'
+
+
+class Variant(NamedTuple):
+    """Одна из миниатюр поста: ширина и формат (None — как у оригинала)."""
+
+    width: int
+    format: Optional[str] = None
+
+    @property
+    def geometry(self) -> str:
+        return f'{self.width}x{round(self.width * POST_THUMBNAIL_RATIO)}'
+
+    @property
+    def options(self) -> dict:
+        if self.format:
+            return {**POST_THUMBNAIL_OPTIONS, 'format': self.format}
+        return POST_THUMBNAIL_OPTIONS
+
+
+def variants() -> List[Variant]:
+    """Все миниатюры, которые строятся для картинки поста.
+
+    WebP строится, только если Pillow собран с его поддержкой.
+    """
+    formats = [None]
+    if features.check('webp'):
+        formats.append(WEBP)
+    return [
+        Variant(width, image_format)
+        for image_format in formats
+        for width in sorted(POST_IMAGE_WIDTHS)
+    ]
+
+
+DEFAULT_VARIANT = Variant(max(POST_IMAGE_WIDTHS))
+
+
+def thumbnail_options(source: ImageFile, options: dict) -> dict:
+    """Дополняет опции так же, как ThumbnailBackend.get_thumbnail.
+
+    От итоговых опций зависит имя миниатюры, поэтому без этого шага
+    поиск готовой миниатюры не совпал бы с ее генерацией.
+    """
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', default.backend._get_format(source))
+    for key, value in ThumbnailBackend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in ThumbnailBackend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def thumbnail_file(image, geometry: str, options: dict) -> ImageFile:
+    """Файл миниатюры, в который ее положил бы sorl. Сам файл не читает."""
+    source = ImageFile(image)
+    name = default.backend._get_thumbnail_filename(
+        source,
+        geometry,
+        thumbnail_options(source, options),
+    )
+    return ImageFile(name, default.storage)
+
+
+def ready_thumbnail(image) -> Optional[ImageFile]:
+    """Основная готовая миниатюра поста или None."""
+    if not image:
+        return None
+    return ready_thumbnails([image]).get(image.name, {}).get(DEFAULT_VARIANT)
+
+
+def ready_thumbnails(
+    images: Iterable,
+) -> Dict[str, Dict[Variant, ImageFile]]:
+    """Готовые миниатюры сразу для нескольких картинок.
+
+    Вместо поиска по одному ключу на миниатюру делает один get_many
+    к кэшу sorl и, для промахов, один запрос к его таблице. Отсутствие
+    миниатюры кэшируется лишь на THUMBNAIL_MISS_TIMEOUT: воркер
+    перезаписывает ключ сам, а короткий срок страхует от случая, когда
+    его запись в кэш не дошла.
+
+    Returns:
+        Словарь {имя картинки: {вариант: миниатюра}}. Еще не
+        построенных вариантов в нем нет.
+    """
+    thumbnails = {
+        (image.name, variant): thumbnail_file(
+            image,
+            variant.geometry,
+            variant.options,
+        )
+        for image in images
+        if image
+        for variant in variants()
+    }
+    ready = {}
+    if not thumbnails:
+        return ready
+    store = default.kvstore
+    if not hasattr(store, 'cache'):
+        # Хранилище без кэша перед БД: пакетно читать нечего.
+        for (name, variant), thumbnail in thumbnails.items():
+            found = store.get(thumbnail)
+            if found:
+                ready.setdefault(name, {})[variant] = found
+        return ready
+    keys = {
+        add_prefix(thumbnail.key): pair
+        for pair, thumbnail in thumbnails.items()
+    }
+    values = store.cache.get_many(keys)
+    missing = set(keys) - set(values)
+    if missing:
+        rows = dict(
+            KVStore.objects.filter(key__in=missing).values_list(
+                'key',
+                'value',
+            ),
+        )
+        store.cache.set_many(rows, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        store.cache.set_many(
+            {key: EMPTY_VALUE for key in missing - set(rows)},
+            THUMBNAIL_MISS_TIMEOUT,
+        )
+        values.update(rows)
+    for key, value in values.items():
+        if value and value != EMPTY_VALUE:
+            name, variant = keys[key]
+            ready.setdefault(name, {})[variant] = deserialize_image_file(value)
+    return ready
+
+
+def srcset(
+    thumbnails: Dict[Variant, ImageFile],
+    image_format: Optional[str] = None,
+) -> str:
+    """Атрибут srcset из готовых миниатюр одного формата."""
+    return ', '.join(
+        f'{thumbnail.url} {variant.width}w'
+        for variant, thumbnail in sorted(
+            thumbnails.items(),
+            key=lambda item: item[0].width,
+        )
+        if variant.format == image_format
+    )
+
+
+def resolve_posts(posts: Iterable) -> None:
+    """Проставляет постам URL миниатюр одним пакетным поиском.
+
+    Каждый пост с картинкой получает thumbnail_url (пока миниатюры нет —
+    URL оригинала), его размеры thumbnail_width и thumbnail_height,
+    thumbnail_srcset и thumbnail_webp_srcset. Сами файлы не открываются.
+    """
+    posts = [post for post in posts if post.image]
+    ready = ready_thumbnails(post.image for post in posts)
+    for post in posts:
+        thumbnails = ready.get(post.image.name, {})
+        default_thumbnail = thumbnails.get(DEFAULT_VARIANT)
+        if default_thumbnail:
+            post.thumbnail_url = default_thumbnail.url
+            post.thumbnail_width = default_thumbnail.width
+            post.thumbnail_height = default_thumbnail.height
+        else:
+            post.thumbnail_url = post.image.url
+            post.thumbnail_width = post.image_width
+            post.thumbnail_height = post.image_height
+        post.thumbnail_srcset = srcset(thumbnails)
+        post.thumbnail_webp_srcset = srcset(thumbnails, WEBP)
+
+
+def build(post) -> None:
+    """Строит недостающие миниатюры поста из одного декодирования оригинала.
+
+    sorl.get_thumbnail открывает и декодирует оригинал на каждый вариант.
+    Здесь оригинал читается один раз, а его размер берется из
+    метаданных поста, если они уже записаны.
+    """
+    source = ImageFile(post.image)
+    if post.image_width and post.image_height:
+        source.set_size((post.image_width, post.image_height))
+    existing, pending = [], []
+    for variant in variants():
+        thumbnail = thumbnail_file(
+            post.image,
+            variant.geometry,
+            variant.options,
+        )
+        if default.kvstore.get(thumbnail):
+            continue
+        # Как и sorl, готовый файл не перезаписываем: хранилище
+        # сохранило бы новый под другим именем.
+        if thumbnail.exists():
+            existing.append(thumbnail)
+        else:
+            pending.append((variant, thumbnail))
+    if pending:
+        source_image = default.engine.get_image(source)
+        try:
+            source.set_size(
+                source.size or default.engine.get_image_size(source_image),
+            )
+            image_info = default.engine.get_image_info(source_image)
+            for variant, thumbnail in pending:
+                options = thumbnail_options(source, variant.options)
+                options['image_info'] = image_info
+                default.backend._create_thumbnail(
+                    source_image,
+                    variant.geometry,
+                    options,
+                    thumbnail,
+                )
+        finally:
+            default.engine.cleanup(source_image)
+    thumbnails = existing + [thumbnail for _, thumbnail in pending]
+    if thumbnails:
+        default.kvstore.get_or_set(source)
+    for thumbnail in thumbnails:
+        default.kvstore.set(thumbnail, source)
+
+
+def generate(post_id: int) -> None:
+    """Строит все миниатюры поста.
+
+    Пока миниатюр нет, страницы показывают оригинал и кэшируют его
+    URL, поэтому после построения версии поста сбрасываются. Ошибки
+    построения не глушатся: задачу по ним откладывает process.
+    """
+    post = (
+        Post.objects.only(
+            'image',
+            'image_width',
+            'image_height',
+            'author_id',
+            'group_id',
+        )
+        .filter(pk=post_id)
+        .first()
+    )
+    if post is not None and post.image:
+        build(post)
+        bump_post_versions(post)
+
+
+def schedule(post) -> None:
+    """Ставит построение миниатюр в очередь.
+
+    Задача пишется в ту же транзакцию, что и пост, и выполняется
+    командой generate_thumbnails, а не в процессе, обслуживающем запрос.
+    """
+    if post.image:
+        ThumbnailTask.objects.get_or_create(post=post)
+
+
+def retry(post_id: int, attempts: int) -> None:
+    """Возвращает в очередь задачу, попытка которой не удалась.
+
+    Задержка удваивается с каждой попыткой, а после
+    THUMBNAIL_MAX_ATTEMPTS задача снимается: пост показывает оригинал,
+    пока картинку не загрузят заново.
+
+    Args:
+        attempts: число неудачных попыток, включая эту.
+    """
+    if attempts >= THUMBNAIL_MAX_ATTEMPTS:
+        logger.error(
+            'Миниатюры поста %s не построены за %s попыток',
+            post_id,
+            attempts,
+        )
+        return
+    if not Post.objects.filter(pk=post_id).exists():
+        return
+    delay = timedelta(seconds=THUMBNAIL_RETRY_DELAY * 2 ** (attempts - 1))
+    # Если пост уже поставили в очередь заново, та задача свежее.
+    ThumbnailTask.objects.get_or_create(
+        post_id=post_id,
+        defaults={'attempts': attempts, 'run_after': timezone.now() + delay},
+    )
+
+
+def process(batch_size: int) -> int:
+    """Выполняет до batch_size задач, срок которых наступил.
+
+    Задача забирается до генерации удалением прочитанной строки: из
+    параллельных воркеров ее выполняет тот, чей DELETE ее удалил. Так
+    работает и SQLite, где нет select_for_update(skip_locked=True).
+    Постановка поста в очередь во время генерации создает новую
+    задачу, и она не теряется. Неудачная задача возвращается в
+    очередь через retry.
+
+    Returns:
+        Число выполненных задач.
+    """
+    tasks = list(
+        ThumbnailTask.objects.filter(
+            run_after__lte=timezone.now(),
+        ).values_list('post_id', 'created', 'attempts')[:batch_size],
+    )
+    done = 0
+    for post_id, created, attempts in tasks:
+        claimed, _ = ThumbnailTask.objects.filter(
+            post_id=post_id,
+            created=created,
+        ).delete()
+        if not claimed:
+            continue
+        try:
+            generate(post_id)
+        except Exception:
+            logger.exception(
+                'Не удалось построить миниатюры поста %s',
+                post_id,
+            )
+            retry(post_id, attempts + 1)
+            continue
+        done += 1
+    return done
@@ -0,0 +1,125 @@
+import os
+from typing import Optional
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from PIL import Image, ImageOps
+
+from yatube.settings import (
+    POST_IMAGE_MAX_BYTES,
+    POST_IMAGE_MAX_PIXELS,
+    POST_IMAGE_MAX_SIDE,
+)
+
+
+def check_limits(upload: UploadedFile) -> None:
+    """Проверяет размер загрузки до декодирования картинки.
+
+    Размер файла известен после потоковой записи на диск, а ширина
+    и высота — из заголовка, который ImageField уже прочитал.
+
+    Raises:
+        ValidationError: файл или картинка больше допустимого.
+    """
+    if upload.size > POST_IMAGE_MAX_BYTES:
+        raise ValidationError(
+            'Файл больше %(limit)d МБ.',
+            code='file_too_large',
+            params={'limit': POST_IMAGE_MAX_BYTES // (1024 * 1024)},
+        )
+    width, height = upload.image.size
+    if width * height > POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка больше %(limit)d мегапикселей.',
+            code='too_many_pixels',
+            params={'limit': POST_IMAGE_MAX_PIXELS // 1_000_000},
+        )
+
+
+def _smoothable(image: Image.Image) -> Image.Image:
+    """Переводит палитру и 1-битную картинку в полноцветный режим.
+
+    С ними не работает reduce, а resize уменьшал бы их без сглаживания.
+    """
+    if image.mode == '1':
+        return image.convert('L')
+    if image.mode in ('P', 'PA'):
+        has_alpha = image.mode == 'PA' or 'transparency' in image.info
+        return image.convert('RGBA' if has_alpha else 'RGB')
+    return image
+
+
+def downscale(upload: UploadedFile) -> UploadedFile:
+    """Уменьшает оригинал, если его сторона больше POST_IMAGE_MAX_SIDE.
+
+    JPEG декодируется сразу в уменьшенном масштабе через draft, и
+    полноразмерной копии в памяти не бывает. Прочие форматы
+    декодируются целиком, их пиковую память ограничивает только
+    POST_IMAGE_MAX_PIXELS; reduce лишь удешевляет сглаживание.
+    Поворот из EXIF применяется к пикселям, EXIF и ICC-профиль
+    переносятся в результат. Результат пишется во временный файл.
+
+    Returns:
+        Исходную загрузку или новую, уменьшенную.
+    """
+    width, height = upload.image.size
+    if max(width, height) <= POST_IMAGE_MAX_SIDE:
+        return upload
+    scale = POST_IMAGE_MAX_SIDE / max(width, height)
+    target = (max(1, round(width * scale)), max(1, round(height * scale)))
+    upload.seek(0)
+    with Image.open(upload) as image:
+        image_format = image.format
+        image.draft(image.mode, target)
+        image = _smoothable(image)
+        factor = min(image.width // target[0], image.height // target[1])
+        if factor > 1:
+            image = image.reduce(factor)
+        image.thumbnail(target, Image.LANCZOS)
+        # Поворачивать уже уменьшенную картинку дешевле; тег Orientation
+        # exif_transpose убирает, чтобы поворот не применился дважды.
+        image = ImageOps.exif_transpose(image)
+        params = {}
+        exif = image.getexif()
+        if exif:
+            params['exif'] = exif.tobytes()
+        if image.info.get('icc_profile'):
+            params['icc_profile'] = image.info['icc_profile']
+        resized = TemporaryUploadedFile(
+            upload.name,
+            upload.content_type,
+            0,
+            upload.charset,
+        )
+        image.save(resized, image_format, **params)
+    resized.size = os.path.getsize(resized.temporary_file_path())
+    resized.seek(0)
+    resized.image = Image.open(resized)
+    return resized
+
+
+def read_metadata(file) -> Optional[dict]:
+    """Размеры, объем и формат картинки по ее заголовку.
+
+    Pillow открывает файл лениво, поэтому картинка не декодируется.
+
+    Returns:
+        Словарь полей Post.image_* или None, если файл не картинка.
+    """
+    position = file.tell() if hasattr(file, 'tell') else None
+    try:
+        file.seek(0)
+        with Image.open(file) as image:
+            width, height = image.size
+            image_format = image.format or ''
+    except (OSError, ValueError):
+        return None
+    finally:
+        if position is not None:
+            file.seek(position)
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_size': file.size,
+        'image_format': image_format,
+    }
@@ -10,11 +10,18 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('search/', views.search_posts, name='search'),
     path('posts/<int:pk>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:pk>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:pk>/comment/', views.add_comment, name='add_comment'),
+    path(
+        'posts/<int:pk>/comments/',
+        views.post_comments,
+        name='post_comments',
+    ),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/bulk/', views.follow_bulk, name='follow_bulk'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -1,8 +1,282 @@
-from django.core.paginator import Paginator
+from typing import Optional, Tuple
 
-from yatube.settings import QTY_POSTS_TO_PAGE
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.encoding import force_bytes, force_str
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 
+from posts.models import Comment
+from yatube.settings import QTY_COMMENTS_TO_PAGE, QTY_POSTS_TO_PAGE
 
-def page(queryset, request):
-    paginator = Paginator(queryset, QTY_POSTS_TO_PAGE)
+CURSOR_FIELD = 'pub_date'
+CURSOR_TIEBREAK = 'pk'
+CURSOR_SEPARATOR = '|'
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(
+    obj,
+    number: int,
+    direction: str,
+    field: str,
+    tiebreak: str = CURSOR_TIEBREAK,
+) -> str:
+    """Упаковывает позицию записи в непрозрачный токен.
+
+    Args:
+        obj: запись, относительно которой строится страница.
+        number: номер страницы, на которую ведет токен.
+        direction: NEXT — записи после obj, PREVIOUS — записи до obj.
+        field: поле, по которому отсортирована выдача.
+        tiebreak: целочисленное поле, упорядочивающее записи
+            с одинаковым field.
+
+    Returns:
+        Строка, пригодная для передачи в параметре ``cursor``.
+    """
+    value = getattr(obj, field)
+    value = value.isoformat() if hasattr(value, 'isoformat') else value
+    raw = CURSOR_SEPARATOR.join(
+        (direction, str(number), str(getattr(obj, tiebreak)), str(value)),
+    )
+    return urlsafe_base64_encode(force_bytes(raw))
+
+
+def decode_cursor(token: str) -> Optional[Tuple[str, int, int, str]]:
+    """Распаковывает токен, собранный encode_cursor.
+
+    Returns:
+        Кортеж (направление, номер страницы, значение tiebreak,
+        значение поля) или None, если токен поврежден.
+    """
+    try:
+        raw = force_str(urlsafe_base64_decode(token))
+        direction, number, pk, value = raw.split(CURSOR_SEPARATOR, 3)
+        number, pk = int(number), int(pk)
+    except (TypeError, ValueError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or number < 1:
+        return None
+    return direction, number, pk, value
+
+
+def next_cursor(page_obj: Page) -> Optional[str]:
+    if not page_obj.has_next():
+        return None
+    return encode_cursor(
+        page_obj[len(page_obj) - 1],
+        page_obj.number + 1,
+        NEXT,
+        getattr(page_obj.paginator, 'field', CURSOR_FIELD),
+        getattr(page_obj.paginator, 'tiebreak', CURSOR_TIEBREAK),
+    )
+
+
+def previous_cursor(page_obj: Page) -> Optional[str]:
+    if not page_obj.has_previous() or not len(page_obj):
+        return None
+    return encode_cursor(
+        page_obj[0],
+        page_obj.number - 1,
+        PREVIOUS,
+        getattr(page_obj.paginator, 'field', CURSOR_FIELD),
+        getattr(page_obj.paginator, 'tiebreak', CURSOR_TIEBREAK),
+    )
+
+
+class CursorPage(Page):
+    """Страница, выбранная по ключу (field, pk) вместо OFFSET."""
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def has_previous(self) -> bool:
+        return self.number > 1
+
+    def next_page_number(self) -> int:
+        return self.number + 1
+
+    @property
+    def next_cursor(self) -> Optional[str]:
+        return next_cursor(self)
+
+    @property
+    def previous_cursor(self) -> Optional[str]:
+        return previous_cursor(self)
+
+
+class CountedPaginator(Paginator):
+    """Пагинатор, которому можно передать заранее известное число записей.
+
+    Без count ведет себя как обычный Paginator и считает выборку сам.
+    field и tiebreak — ключ, которым курсор продолжит выдачу с любой
+    страницы, в том числе с выбранной по номеру.
+    """
+
+    def __init__(
+        self,
+        object_list,
+        per_page,
+        count=None,
+        field=CURSOR_FIELD,
+        tiebreak=CURSOR_TIEBREAK,
+        **kwargs,
+    ):
+        super().__init__(object_list, per_page, **kwargs)
+        self._count = count
+        self.field = field
+        self.tiebreak = tiebreak
+
+    @cached_property
+    def count(self) -> int:
+        if self._count is None:
+            return super().count
+        return self._count
+
+
+class CursorPaginator(CountedPaginator):
+    """Пагинатор, листающий выдачу запросами «до/после курсора».
+
+    Глубина страницы не влияет на стоимость запроса: вместо
+    ``OFFSET n`` используется условие по паре (field, tiebreak).
+    Обе могут быть аннотациями, если выдачу упорядочивает
+    присоединенная таблица.
+    """
+
+    def sort_field(self):
+        """Поле модели или аннотации, по которому отсортирована выдача."""
+        query = self.object_list.query
+        if self.field in query.annotations:
+            return query.annotations[self.field].output_field
+        return self.object_list.model._meta.get_field(self.field)
+
+    def parse_value(self, value: str):
+        """Приводит значение из токена к типу поля сортировки.
+
+        Returns:
+            Значение поля или None, если токен подделан.
+        """
+        try:
+            return self.sort_field().to_python(value)
+        except (TypeError, ValueError, ValidationError):
+            return None
+
+    def get_page(self, cursor: Optional[str]) -> CursorPage:
+        decoded = decode_cursor(cursor) if cursor else None
+        if decoded is not None:
+            direction, number, pk, value = decoded
+            value = self.parse_value(value)
+        if decoded is None or value is None:
+            return self._keyset_page(self.object_list, 1, NEXT)
+        if direction == NEXT:
+            queryset = self.object_list.filter(
+                Q(**{f'{self.field}__lt': value})
+                | Q(**{self.field: value, f'{self.tiebreak}__lt': pk}),
+            )
+        else:
+            queryset = self.object_list.filter(
+                Q(**{f'{self.field}__gt': value})
+                | Q(**{self.field: value, f'{self.tiebreak}__gt': pk}),
+            )
+        return self._keyset_page(queryset, number, direction)
+
+    def _keyset_page(self, queryset, number, direction) -> CursorPage:
+        if direction == NEXT:
+            queryset = queryset.order_by(
+                f'-{self.field}',
+                f'-{self.tiebreak}',
+            )
+        else:
+            queryset = queryset.order_by(self.field, self.tiebreak)
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == NEXT:
+            return CursorPage(rows, number, self, has_next=has_more)
+        rows.reverse()
+        if not has_more:
+            number = 1
+        return CursorPage(rows, number, self, has_next=True)
+
+
+class RankedPaginator(CountedPaginator):
+    """Пагинатор по заранее ранжированному списку.
+
+    Курсор хранит позицию записи в списке, поэтому соседняя страница —
+    это срез списка без повторного ранжирования.
+    """
+
+    def __init__(self, object_list, per_page, **kwargs):
+        super().__init__(
+            object_list,
+            per_page,
+            field='search_position',
+            **kwargs,
+        )
+
+    def get_page(self, cursor: Optional[str]) -> CursorPage:
+        decoded = decode_cursor(cursor) if cursor else None
+        number, start = 1, 0
+        if decoded is not None:
+            direction, number, _, position = decoded
+            try:
+                position = int(position)
+            except ValueError:
+                position = -1
+            if direction == NEXT:
+                start = position + 1
+            else:
+                start = position - self.per_page
+            if start <= 0:
+                number, start = 1, 0
+        rows = self.object_list[start:start + self.per_page]
+        page_obj = CursorPage(
+            rows,
+            number,
+            self,
+            has_next=start + self.per_page < self.count,
+        )
+        page_obj.offset = start
+        return page_obj
+
+
+def page(
+    queryset,
+    request,
+    count=None,
+    field=CURSOR_FIELD,
+    tiebreak=CURSOR_TIEBREAK,
+):
+    # Страницы по номеру упорядочены так же, как курсор: иначе записи
+    # с одинаковым field на границе страниц зависели бы от базы.
+    queryset = queryset.order_by(f'-{field}', f'-{tiebreak}')
+    options = {'count': count, 'field': field, 'tiebreak': tiebreak}
+    cursor = request.GET.get('cursor')
+    if cursor:
+        paginator = CursorPaginator(queryset, QTY_POSTS_TO_PAGE, **options)
+        return paginator.get_page(cursor)
+    paginator = CountedPaginator(queryset, QTY_POSTS_TO_PAGE, **options)
     return paginator.get_page(request.GET.get('page'))
+
+
+def comments_page(post_id: int, request) -> CursorPage:
+    """Страница комментариев поста вместе с авторами одним запросом."""
+    comments = (
+        Comment.objects.filter(post_id=post_id)
+        .select_related('author')
+        .only('text', 'created', 'post_id', 'author__username')
+        .order_by('-created', '-pk')
+    )
+    paginator = CursorPaginator(
+        comments,
+        QTY_COMMENTS_TO_PAGE,
+        field='created',
+    )
+    return paginator.get_page(request.GET.get('cursor'))
@@ -0,0 +1,57 @@
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY = 'posts:version:{scope}'
+INDEX_SCOPE = 'index'
+
+
+def group_scope(group_id: int) -> str:
+    return f'group:{group_id}'
+
+
+def author_scope(author_id: int) -> str:
+    return f'author:{author_id}'
+
+
+def follow_scope(user_id: int) -> str:
+    return f'follow:{user_id}'
+
+
+def followers_scope(author_id: int) -> str:
+    return f'followers:{author_id}'
+
+
+def _key(scope: str) -> str:
+    return VERSION_KEY.format(scope=scope)
+
+
+def get_version(scope: str) -> float:
+    """Версия содержимого выборки — время его последнего изменения.
+
+    Версия входит в ключи кэша фрагментов, поэтому смена версии сразу
+    делает старые фрагменты недостижимыми, а истекают они сами.
+    """
+    version = cache.get(_key(scope))
+    if version is None:
+        cache.add(_key(scope), time.time(), None)
+        version = cache.get(_key(scope))
+    return version
+
+
+def get_versions(*scopes: str) -> list:
+    """Версии нескольких выборок одним обращением к кэшу."""
+    keys = [_key(scope) for scope in scopes]
+    stamps = cache.get_many(keys)
+    missing = [key for key in keys if key not in stamps]
+    if missing:
+        stamp = time.time()
+        for key in missing:
+            cache.add(key, stamp, None)
+        stamps.update(cache.get_many(missing))
+    return [stamps.get(key) for key in keys]
+
+
+def bump(*scopes: str) -> None:
+    stamp = time.time()
+    cache.set_many({_key(scope): stamp for scope in scopes}, None)
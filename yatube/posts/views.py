@@ -1,55 +1,134 @@
+from http import HTTPStatus
+from urllib.parse import urlencode
+
 from django.contrib.auth.decorators import login_required
-from django.http import HttpRequest, HttpResponse
+from django.http import HttpRequest, HttpResponse, HttpResponseBadRequest
 from django.shortcuts import get_object_or_404, redirect, render
-
-from posts.forms import CommentForm, PostForm
+from django.views.decorators.http import require_POST
+
+from posts import (
+    conditions,
+    counters,
+    feed,
+    follows,
+    search,
+    stats,
+    versions,
+)
+from posts.forms import FOLLOW, BulkFollowForm, CommentForm, PostForm
 from posts.models import Follow, Group, Post, User
-from posts.utils import page
+from posts.utils import RankedPaginator, comments_page, page
+from yatube.settings import (
+    FEED_CACHE_TIMEOUT,
+    INDEX_CACHE_TIMEOUT,
+    QTY_POSTS_TO_PAGE,
+)
 
 
+@conditions.index
 def index(request: HttpRequest) -> HttpResponse:
+    following_ids = follows.following_ids(request.user)
     return render(
         request,
         'posts/index.html',
         {
-            'page_obj': page(Post.objects.select_related('group'), request),
+            'following_ids': following_ids,
+            'following_key': follows.following_digest(following_ids),
+            'author_key': follows.own_posts_key(request.user),
+            'page_obj': page(
+                Post.objects.for_feed(),
+                request,
+                counters.index_count(),
+            ),
+            'index_version': versions.get_version(versions.INDEX_SCOPE),
+            'cache_timeout': INDEX_CACHE_TIMEOUT,
         },
     )
 
 
+@conditions.group
 def group_posts(request: HttpRequest, slug: int) -> HttpResponse:
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('group')
+    posts = group.posts.for_feed()
     return render(
         request,
         'posts/group_list.html',
         {
             'group': group,
-            'page_obj': page(posts, request),
+            'page_obj': page(posts, request, counters.group_count(group)),
         },
     )
 
 
+@conditions.profile
 def profile(request: HttpRequest, username: str) -> HttpResponse:
-    author = get_object_or_404(User, username=username)
-    posts_list = author.posts.all()
-    if Follow.objects.filter(user=request.user.id).filter(author=author):
-        following = True
-    else:
-        following = False
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username,
+    )
+    posts_list = author.posts.for_feed()
+    author_stats = stats.for_author(author)
+    following = author.pk in follows.following_ids(request.user)
     return render(
         request,
         'posts/profile.html',
         {
             'author': author,
-            'page_obj': page(posts_list, request),
+            'stats': author_stats,
+            'page_obj': page(posts_list, request, author_stats.posts_count),
             'following': following,
         },
     )
 
 
+def search_posts(request: HttpRequest) -> HttpResponse:
+    query = request.GET.get('q', '').strip()
+    group = author = None
+    if request.GET.get('group'):
+        group = get_object_or_404(Group, slug=request.GET['group'])
+    if request.GET.get('author'):
+        author = get_object_or_404(User, username=request.GET['author'])
+    context = {'query': query, 'group': group, 'author': author}
+    try:
+        results = search.ranked_results(
+            query,
+            group.pk if group else None,
+            author.pk if author else None,
+        )
+    except search.SearchUnavailable:
+        return render(
+            request,
+            'posts/search.html',
+            {**context, 'unavailable': True},
+            status=HTTPStatus.SERVICE_UNAVAILABLE,
+        )
+    page_obj = RankedPaginator(results, QTY_POSTS_TO_PAGE).get_page(
+        request.GET.get('cursor'),
+    )
+    search.load_posts(page_obj)
+    filters = {
+        'q': query,
+        'group': group.slug if group else '',
+        'author': author.username if author else '',
+    }
+    return render(
+        request,
+        'posts/search.html',
+        {
+            **context,
+            'page_obj': page_obj,
+            'filters': urlencode(
+                {name: value for name, value in filters.items() if value},
+            ),
+        },
+    )
+
+
 def post_detail(request: HttpRequest, pk: int) -> HttpResponse:
-    post = get_object_or_404(Post, pk=pk)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        pk=pk,
+    )
     form = CommentForm(request.POST or None)
     return render(
         request,
@@ -57,13 +136,26 @@ def post_detail(request: HttpRequest, pk: int) -> HttpResponse:
         {
             'post': post,
             'form': form,
+            'comments': comments_page(post.pk, request),
+        },
+    )
+
+
+def post_comments(request: HttpRequest, pk: int) -> HttpResponse:
+    post = get_object_or_404(Post.objects.only('pk'), pk=pk)
+    return render(
+        request,
+        'posts/includes/comments.html',
+        {
+            'post': post,
+            'comments': comments_page(post.pk, request),
         },
     )
 
 
 @login_required
 def post_create(request: HttpRequest):
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     if not request.method == 'POST' or not form.is_valid():
         return render(request, 'posts/create_post.html', {'form': form})
 
@@ -111,17 +203,40 @@ def add_comment(request: HttpRequest, pk: int):
 
 @login_required
 def follow_index(request: HttpRequest):
-    posts = Post.objects.filter(author__following__user=request.user)
+    author_ids = sorted(follows.following_ids(request.user))
+    posts = feed.timeline(request.user, author_ids)
     return render(
         request,
         'posts/follow.html',
         {
             'posts': posts,
-            'page_obj': page(posts, request),
+            'page_obj': page(
+                posts,
+                request,
+                counters.feed_count(author_ids),
+                field=feed.TIMELINE_FIELD,
+                tiebreak=feed.TIMELINE_TIEBREAK,
+            ),
+            'feed_version': feed.feed_version(request.user, author_ids),
+            'cache_timeout': FEED_CACHE_TIMEOUT,
         },
     )
 
 
+@login_required
+@require_POST
+def follow_bulk(request: HttpRequest) -> HttpResponse:
+    form = BulkFollowForm(request.POST)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+    author_ids = [author.pk for author in form.cleaned_data['authors']]
+    if form.cleaned_data['action'] == FOLLOW:
+        follows.follow_many(request.user, author_ids)
+    else:
+        follows.unfollow_many(request.user, author_ids)
+    return redirect('posts:follow_index')
+
+
 @login_required
 def profile_follow(request: HttpRequest, username: str):
     author = get_object_or_404(User, username=username)
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 # BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -95,6 +96,8 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 
 QTY_POSTS_TO_PAGE = 10
 
+QTY_COMMENTS_TO_PAGE = 20
+
 LOGIN_URL = 'users:login'
 
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -109,10 +112,92 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Версии фрагментов, подписки и миниатюры живут в кэше бессрочно или
+# часами, поэтому кэш должен быть общим для всех процессов сервера
+# и воркера миниатюр: LocMemCache у каждого процесса свой. Бэкенд и
+# адрес задаются переменными YATUBE_CACHE_BACKEND и
+# YATUBE_CACHE_LOCATION; если сайт обслуживают несколько хостов, нужен
+# memcached. Файловый кэш по умолчанию годится для одного хоста, но
+# его incr и add не атомарны, а при переполнении он удаляет случайные
+# ключи. Поэтому счетчики постов хранятся в базе (posts.counters), а
+# удаленная версия лишь заводится заново и дает промах фрагментов.
+# Файловый кэш на каждой записи перечисляет свои файлы, поэтому
+# MAX_ENTRIES ограничивает и стоимость записи.
+CACHE_BACKEND = os.environ.get(
+    'YATUBE_CACHE_BACKEND',
+    'django.core.cache.backends.filebased.FileBasedCache',
+)
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_LOCATION',
+            str(BASE_DIR / 'cache'),
+        ),
     },
 }
+if CACHE_BACKEND.endswith('.FileBasedCache'):
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': 10_000}
+
+TEST_RUNNER = 'posts.tests.runner.IsolatedCacheRunner'
 
 REDUCTION_SYMB_NUM = 15
+
+INDEX_CACHE_TIMEOUT = 60 * 60 * 6
+
+FEED_CACHE_TIMEOUT = 60 * 60
+
+POSTS_COUNT_CACHE_TIMEOUT = 60 * 60
+
+POSTS_COUNT_ESTIMATE = False
+
+TIMELINE_BATCH_SIZE = 500
+
+FEED_PUSH_FOLLOWERS_LIMIT = 10_000
+
+FEED_PULLED_AUTHORS_TIMEOUT = 10 * 60
+
+THUMBNAIL_BATCH_SIZE = 50
+
+THUMBNAIL_POLL_INTERVAL = 5
+
+THUMBNAIL_MISS_TIMEOUT = 60
+
+# После неудачи задача откладывается на THUMBNAIL_RETRY_DELAY, и
+# задержка удваивается с каждой попыткой до THUMBNAIL_MAX_ATTEMPTS.
+THUMBNAIL_RETRY_DELAY = 60
+
+THUMBNAIL_MAX_ATTEMPTS = 10
+
+MEDIA_MIGRATION_BATCH_SIZE = 500
+
+IMAGE_RELEASE_GRACE = 60 * 60
+
+SEARCH_MAX_TERMS = 10
+
+SEARCH_MIN_TERM_LENGTH = 3
+
+SEARCH_MAX_RESULTS = 200
+
+SEARCH_SNIPPET_TOKENS = 16
+
+SEARCH_CACHE_TIMEOUT = 60
+
+POST_IMAGE_WIDTHS = (320, 640, 960)
+
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+POST_IMAGE_MAX_BYTES = 20 * 1024 * 1024
+
+POST_IMAGE_MAX_PIXELS = 50_000_000
+
+POST_IMAGE_MAX_SIDE = 2560
+
+ADMIN_FILTER_OPTIONS = 10
+
+FOLLOW_BULK_LIMIT = 100
+
+FOLLOWING_CACHE_TIMEOUT = 60 * 60 * 24